@@ -130,3 +130,5 @@ CREATE INDEX IF NOT EXISTS idx_signals_user ON trading_signals(user_id);
 CREATE INDEX IF NOT EXISTS idx_notifications_user ON notification_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_watchlist_user ON market_watchlist(user_id);
 CREATE INDEX IF NOT EXISTS idx_snapshots_symbol ON market_snapshots(symbol, captured_at);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_symbol ON subscriptions(symbol);
@@ -0,0 +1,21 @@
+"""
+Gunicorn 設定
+
+gunicorn -c gunicorn_conf.py wsgi:app
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+
+# gevent worker：Webhook 的熱路徑 (Telegram、CoinGecko、RSS) 皆為 I/O，
+# 以協程多工即可同時處理大量請求，不必為每個請求佔用一條執行緒
+worker_class = 'gevent'
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', 200))
+
+# 上游 API 都有各自的逾時設定，單一請求不應超過此秒數
+timeout = 30
+graceful_timeout = 10
+keepalive = 5
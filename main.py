@@ -43,12 +43,14 @@ def update_market_data():
         service = CryptoDataService()
         # 更新主要加密貨幣平價數據
         symbols = ['BTC', 'ETH', 'BNB', 'SOL', 'XRP']
+        # 單次批量請求取得所有幣種，避免逐一往返 CoinGecko
+        prices = service.get_coin_prices(symbols)
         for symbol in symbols:
-            try:
-                data = service.get_crypto_price(symbol)
+            data = prices.get(symbol)
+            if data:
                 logger.info(f"✓ {symbol}: ${data.get('price', 'N/A')}")
-            except Exception as e:
-                logger.error(f"✗ {symbol} 更新失敗: {e}")
+            else:
+                logger.error(f"✗ {symbol} 更新失敗")
         
         logger.info("✅ 市場數據更新完成")
     except Exception as e:
@@ -4,16 +4,59 @@
 支援智慧新聞源 Round-Robin 容錯機制
 """
 
+import os
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
+import threading
 from typing import Dict, List, Optional, Any, Callable
 from datetime import datetime, timedelta
 from enum import Enum
+from types import MappingProxyType
 from dataclasses import dataclass, field
 import time
 
 logger = logging.getLogger(__name__)
 
+# API 回應快取秒數：價格變動快，市場總覽與恐懼貪婪指數更新較慢
+PRICE_CACHE_TTL = int(os.getenv('CACHE_TTL_SECONDS', 30))
+MARKET_CACHE_TTL = 300
+RESPONSE_CACHE_MAXSIZE = 256
+# 回應快取 ((url, params) -> (到期時間, 資料))，所有服務實例共用
+_response_cache = {}
+_response_cache_lock = threading.Lock()
+
+# 共用 HTTP Session：排程任務每次都建立新的服務實例，連線池放在模組層級才能跨任務重用
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# 符號映射 (處理常見縮寫)，所有實例共用且唯讀
+COIN_ID_MAP = MappingProxyType({
+    'BTC': 'bitcoin',
+    'ETH': 'ethereum',
+    'BNB': 'binancecoin',
+    'SOL': 'solana',
+    'XRP': 'ripple',
+    'ADA': 'cardano',
+    'DOGE': 'dogecoin',
+    'DOT': 'polkadot',
+    'MATIC': 'matic-network',
+    'AVAX': 'avalanche-2'
+})
+
+# 新聞情緒 -> emoji
+SENTIMENT_EMOJI = MappingProxyType({
+    'positive': '🚀',
+    'neutral': '⚖️',
+    'negative': '📉'
+})
+
 
 # ==================== 智慧新聞源管理 ====================
 
@@ -207,6 +250,7 @@ class CryptoDataService:
         # 請求限制
         self.last_request_time = {}
         self.min_request_interval = 1.0  # 秒
+        self._rate_limit_lock = threading.Lock()
         
         # 初始化智慧新聞源管理器
         self.news_manager = SmartNewsManager()
@@ -236,24 +280,41 @@ class CryptoDataService:
         logger.info(f"Initialized {len(self.news_manager.sources)} news sources")
     
     def _rate_limit(self, api_name: str):
-        """簡單的速率限制"""
-        now = time.time()
-        if api_name in self.last_request_time:
-            elapsed = now - self.last_request_time[api_name]
-            if elapsed < self.min_request_interval:
-                time.sleep(self.min_request_interval - elapsed)
-        self.last_request_time[api_name] = time.time()
+        """簡單的速率限制：同一 API 的請求至少間隔 min_request_interval 秒"""
+        # 在鎖內預約下一個可用時間再於鎖外等待，多執行緒同時呼叫也不會重疊
+        with self._rate_limit_lock:
+            now = time.time()
+            scheduled = max(now, self.last_request_time.get(api_name, 0) + self.min_request_interval)
+            self.last_request_time[api_name] = scheduled
+        if scheduled > now:
+            time.sleep(scheduled - now)
     
-    def _make_request(self, url: str, params: Optional[Dict] = None, api_name: str = "default") -> Optional[Dict]:
-        """統一的請求處理"""
+    def _make_request(self, url: str, params: Optional[Dict] = None, api_name: str = "default",
+                      ttl: float = 0) -> Optional[Dict]:
+        """統一的請求處理；ttl > 0 時在期限內直接回傳快取的回應"""
+        cache_key = (url, tuple(sorted(params.items())) if params else ())
+        if ttl > 0:
+            with _response_cache_lock:
+                cached = _response_cache.get(cache_key)
+            if cached and time.monotonic() < cached[0]:
+                return cached[1]
+        
         try:
             self._rate_limit(api_name)
-            response = requests.get(url, params=params, timeout=10)
+            response = _SESSION.get(url, params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            data = orjson.loads(response.content)
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             logger.error(f"API request failed for {url}: {e}")
             return None
+        
+        if ttl > 0:
+            with _response_cache_lock:
+                if len(_response_cache) >= RESPONSE_CACHE_MAXSIZE and cache_key not in _response_cache:
+                    # 移除最早寫入的項目
+                    _response_cache.pop(next(iter(_response_cache)))
+                _response_cache[cache_key] = (time.monotonic() + ttl, data)
+        return data
     
     # ==================== 價格數據 ====================
     
@@ -278,21 +339,7 @@ class CryptoDataService:
             'last_updated': '2026-01-29T18:05:00Z'
         }
         """
-        # 符號映射 (處理常見縮寫)
-        symbol_map = {
-            'BTC': 'bitcoin',
-            'ETH': 'ethereum',
-            'BNB': 'binancecoin',
-            'SOL': 'solana',
-            'XRP': 'ripple',
-            'ADA': 'cardano',
-            'DOGE': 'dogecoin',
-            'DOT': 'polkadot',
-            'MATIC': 'matic-network',
-            'AVAX': 'avalanche-2'
-        }
-        
-        coin_id = symbol_map.get(symbol.upper(), symbol.lower())
+        coin_id = COIN_ID_MAP.get(symbol.upper(), symbol.lower())
         
         url = f"{self.coingecko_base}/coins/{coin_id}"
         params = {
@@ -304,7 +351,7 @@ class CryptoDataService:
             'sparkline': 'false'
         }
         
-        data = self._make_request(url, params, api_name="coingecko")
+        data = self._make_request(url, params, api_name="coingecko", ttl=PRICE_CACHE_TTL)
         
         if not data:
             return None
@@ -330,6 +377,60 @@ class CryptoDataService:
             logger.error(f"Error parsing price data: {e}")
             return None
     
+    def get_coin_prices(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        以單次 CoinGecko /coins/markets 請求批量獲取多個幣種的價格信息
+        
+        返回格式：{'BTC': {...}, 'ETH': {...}}，欄位與 get_coin_price 相同；
+        查不到的幣種不會出現在結果中
+        """
+        if not symbols:
+            return {}
+        
+        ids = {}
+        for symbol in symbols:
+            ids.setdefault(COIN_ID_MAP.get(symbol.upper(), symbol.lower()), symbol.upper())
+        
+        url = f"{self.coingecko_base}/coins/markets"
+        params = {
+            'vs_currency': 'usd',
+            'ids': ','.join(ids),
+            'per_page': len(ids),
+            'page': 1,
+            'sparkline': 'false'
+        }
+        
+        data = self._make_request(url, params, api_name="coingecko", ttl=PRICE_CACHE_TTL)
+        
+        if not data:
+            return {}
+        
+        results = {}
+        try:
+            for coin in data:
+                symbol = ids.get(coin.get('id'))
+                if not symbol:
+                    continue
+                results[symbol] = {
+                    'symbol': coin.get('symbol', '').upper(),
+                    'name': coin.get('name', ''),
+                    'price': coin.get('current_price', 0),
+                    'price_change_24h': coin.get('price_change_24h', 0),
+                    'price_change_percentage_24h': coin.get('price_change_percentage_24h', 0),
+                    'high_24h': coin.get('high_24h', 0),
+                    'low_24h': coin.get('low_24h', 0),
+                    'market_cap': coin.get('market_cap', 0),
+                    'market_cap_rank': coin.get('market_cap_rank', 0),
+                    'total_volume': coin.get('total_volume', 0),
+                    'circulating_supply': coin.get('circulating_supply', 0),
+                    'total_supply': coin.get('total_supply', 0),
+                    'last_updated': coin.get('last_updated', '')
+                }
+        except (KeyError, TypeError, AttributeError) as e:
+            logger.error(f"Error parsing batch price data: {e}")
+        
+        return results
+    
     # ==================== 市場數據 ====================
     
     def get_market_overview(self) -> Optional[Dict]:
@@ -350,7 +451,7 @@ class CryptoDataService:
         """
         # 獲取全局市場數據
         global_url = f"{self.coingecko_base}/global"
-        global_data = self._make_request(global_url, api_name="coingecko")
+        global_data = self._make_request(global_url, api_name="coingecko", ttl=MARKET_CACHE_TTL)
         
         # 獲取 Top 幣種
         markets_url = f"{self.coingecko_base}/coins/markets"
@@ -362,7 +463,7 @@ class CryptoDataService:
             'sparkline': 'false',
             'price_change_percentage': '24h'
         }
-        markets_data = self._make_request(markets_url, markets_params, api_name="coingecko")
+        markets_data = self._make_request(markets_url, markets_params, api_name="coingecko", ttl=MARKET_CACHE_TTL)
         
         if not global_data or not markets_data:
             return None
@@ -435,7 +536,7 @@ class CryptoDataService:
         url = f"{self.alternative_base}/fng/"
         params = {'limit': 1}
         
-        data = self._make_request(url, params, api_name="alternative")
+        data = self._make_request(url, params, api_name="alternative", ttl=MARKET_CACHE_TTL)
         
         if not data or 'data' not in data:
             return None
@@ -604,12 +705,7 @@ def format_percentage(value: float) -> str:
 
 def get_sentiment_emoji(sentiment: str) -> str:
     """根據情緒返回 emoji"""
-    emoji_map = {
-        'positive': '🚀',
-        'neutral': '⚖️',
-        'negative': '📉'
-    }
-    return emoji_map.get(sentiment.lower(), '⚖️')
+    return SENTIMENT_EMOJI.get(sentiment.lower(), '⚖️')
 
 
 def get_fng_emoji(value: int) -> str:
@@ -3,6 +3,7 @@
 整合多個加密貨幣數據提供商
 """
 
+import orjson
 import requests
 import logging
 from typing import Dict, List, Optional
@@ -11,6 +12,9 @@ import time
 
 logger = logging.getLogger(__name__)
 
+# /global 與 /search/trending 約數分鐘才更新一次，期間內直接使用快取
+SLOW_ENDPOINT_TTL = 300
+
 
 class CoinGeckoAPI:
     """CoinGecko API 客戶端 - 免費且功能強大的加密貨幣數據源"""
@@ -22,6 +26,9 @@ class CoinGeckoAPI:
         self.session = requests.Session()
         if api_key:
             self.session.headers.update({'x-cg-pro-api-key': api_key})
+        # (快取時間, 解析後的結果)
+        self._trending_cache = (0.0, None)
+        self._global_cache = (0.0, None)
     
     def get_coin_price(self, coin_ids: List[str], vs_currencies: List[str] = ['usd']) -> Dict:
         """
@@ -49,7 +56,7 @@ class CoinGeckoAPI:
             response.raise_for_status()
             
             logger.info(f"Successfully fetched prices for {len(coin_ids)} coins")
-            return response.json()
+            return orjson.loads(response.content)
             
         except Exception as e:
             logger.error(f"Error fetching coin prices: {e}")
@@ -79,7 +86,7 @@ class CoinGeckoAPI:
             response = self.session.get(endpoint, params=params, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             
             # 提取關鍵信息
             market_data = data.get('market_data', {})
@@ -120,13 +127,19 @@ class CoinGeckoAPI:
         Returns:
             趨勢幣種列表
         """
+        cached_at, cached = self._trending_cache
+        if cached and time.monotonic() - cached_at < SLOW_ENDPOINT_TTL:
+            return cached
+        
         try:
             endpoint = f"{self.BASE_URL}/search/trending"
             response = self.session.get(endpoint, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
-            return data.get('coins', [])
+            data = orjson.loads(response.content)
+            coins = data.get('coins', [])
+            self._trending_cache = (time.monotonic(), coins)
+            return coins
             
         except Exception as e:
             logger.error(f"Error fetching trending coins: {e}")
@@ -139,13 +152,17 @@ class CoinGeckoAPI:
         Returns:
             全球市場統計
         """
+        cached_at, cached = self._global_cache
+        if cached and time.monotonic() - cached_at < SLOW_ENDPOINT_TTL:
+            return cached
+        
         try:
             endpoint = f"{self.BASE_URL}/global"
             response = self.session.get(endpoint, timeout=10)
             response.raise_for_status()
             
-            data = response.json().get('data', {})
-            return {
+            data = orjson.loads(response.content).get('data', {})
+            result = {
                 'total_market_cap_usd': data.get('total_market_cap', {}).get('usd'),
                 'total_volume_24h_usd': data.get('total_volume', {}).get('usd'),
                 'bitcoin_dominance': data.get('market_cap_percentage', {}).get('btc'),
@@ -155,6 +172,8 @@ class CoinGeckoAPI:
                 'market_cap_change_percentage_24h': data.get('market_cap_change_percentage_24h_usd'),
                 'updated_at': data.get('updated_at')
             }
+            self._global_cache = (time.monotonic(), result)
+            return result
             
         except Exception as e:
             logger.error(f"Error fetching global market data: {e}")
@@ -203,7 +222,7 @@ class CryptoPanicAPI:
             response = self.session.get(endpoint, params=params, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             results = data.get('results', [])
             
             # 格式化新聞數據
@@ -281,7 +300,7 @@ class AlternativeMeAPI:
             response = self.session.get(self.BASE_URL, params=params, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             results = data.get('data', [])
             
             formatted_data = []
@@ -3,6 +3,7 @@
 整合多個加密貨幣數據提供商，支援智慧 Round-Robin 容錯機制
 """
 
+import orjson
 import requests
 import logging
 from typing import Dict, List, Optional, Callable
@@ -240,7 +241,7 @@ class CoinGeckoAPI:
             
             response = self.session.get(endpoint, params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
             
         except Exception as e:
             logger.error(f"Error fetching coin prices: {e}")
@@ -274,7 +275,7 @@ class CryptoPanicAPI:
             response = self.session.get(endpoint, params=params, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             results = data.get('results', [])
             
             formatted_news = []
@@ -352,7 +353,7 @@ class FearGreedIndexAPI:
             response = self.session.get(self.BASE_URL, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             if data.get('data'):
                 index_data = data['data'][0]
                 return {
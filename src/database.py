@@ -4,6 +4,9 @@
 """
 import sqlite3
 import logging
+import queue
+import threading
+import time
 from datetime import datetime
 from typing import Optional, List, Dict, Tuple
 import json
@@ -15,27 +18,56 @@ logger = logging.getLogger(__name__)
 class DatabaseManager:
     """資料庫管理類"""
     
+    # 背景寫入佇列：每批最多筆數 / 收集視窗（秒）
+    WRITE_BATCH_SIZE = 32
+    WRITE_BATCH_WINDOW = 0.05
+    
+    # 每位用戶的訂閱 / 監控項目上限，避免單一用戶無限制成長
+    MAX_SUBSCRIPTIONS_PER_USER = 50
+    MAX_WATCHLIST_PER_USER = 50
+    
+    # 已訂閱的幣種原地更新條件 (保留 rowid 與建立時間)；新幣種僅在未達上限時寫入
+    UPSERT_SUBSCRIPTION_SQL = '''
+        INSERT INTO subscriptions (user_id, symbol, condition)
+        SELECT ?, ?, ?
+        WHERE (SELECT COUNT(*) FROM subscriptions WHERE user_id = ?) < ?
+           OR EXISTS (SELECT 1 FROM subscriptions WHERE user_id = ? AND symbol = ?)
+        ON CONFLICT(user_id, symbol) DO UPDATE SET condition = excluded.condition
+    '''
+    
     def __init__(self, db_path: str = 'crypto_bot.db'):
         self.db_path = db_path
+        self._write_queue = queue.Queue()
+        self._writer_thread = None
+        self._writer_lock = threading.Lock()
+        # 每個執行緒各自保留一條長連線，避免每次操作重新開檔與建立 journal
+        self._local = threading.local()
         self.init_database()
     
     def get_connection(self):
-        """獲取資料庫連接"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # 讓查詢結果可以用字典方式訪問
+        """獲取目前執行緒的資料庫連接（首次使用時建立）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # autocommit：每條語句各自提交，不會因中途返回或例外而遺留未提交的交易
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            conn.row_factory = sqlite3.Row  # 讓查詢結果可以用字典方式訪問
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            self._local.conn = conn
         return conn
     
     def init_database(self):
         """初始化資料庫結構"""
         try:
+            # WAL 模式寫入不阻塞讀取；此設定保存在資料庫檔案中
+            self.get_connection().execute('PRAGMA journal_mode=WAL')
+            
             if os.path.exists('database_schema.sql'):
                 with open('database_schema.sql', 'r', encoding='utf-8') as f:
                     schema = f.read()
                 
                 conn = self.get_connection()
                 conn.executescript(schema)
-                conn.commit()
-                conn.close()
             
             # 執行遷移：檢查並添加缺失的欄位
             self._migrate_database()
@@ -104,11 +136,68 @@ class DatabaseManager:
                     )
                 ''')
 
-            conn.commit()
-            conn.close()
+            # 訂閱查詢索引：用戶訂閱列表 (依建立時間排序) 與依幣種找訂閱者
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_subscriptions_user
+                ON subscriptions(user_id, created_at DESC)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_subscriptions_symbol
+                ON subscriptions(symbol)
+            ''')
+
         except Exception as e:
             logger.error(f"資料庫遷移失敗: {e}")
     
+    # ==================== 背景寫入佇列 ====================
+    
+    def enqueue_write(self, sql: str, params: Tuple = ()):
+        """將寫入操作加入背景佇列，由背景執行緒批次提交"""
+        self._ensure_writer()
+        self._write_queue.put((sql, params))
+    
+    def _ensure_writer(self):
+        """啟動背景寫入執行緒（僅啟動一次）"""
+        if self._writer_thread is not None and self._writer_thread.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer_thread is None or not self._writer_thread.is_alive():
+                self._writer_thread = threading.Thread(
+                    target=self._writer_loop, name='db-writer', daemon=True
+                )
+                self._writer_thread.start()
+    
+    def _writer_loop(self):
+        """背景寫入主循環：收集一批寫入後以單一交易提交"""
+        while True:
+            batch = [self._write_queue.get()]
+            deadline = time.monotonic() + self.WRITE_BATCH_WINDOW
+            while len(batch) < self.WRITE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._write_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush_writes(batch)
+    
+    def _flush_writes(self, batch: List[Tuple[str, Tuple]]):
+        """以單一交易提交一批寫入，失敗時改為逐筆提交"""
+        conn = self.get_connection()
+        try:
+            with conn:
+                conn.execute('BEGIN')
+                for sql, params in batch:
+                    conn.execute(sql, params)
+        except Exception as e:
+            logger.error(f"批次寫入失敗，改為逐筆寫入: {e}")
+            for sql, params in batch:
+                try:
+                    conn.execute(sql, params)
+                except Exception as e:
+                    logger.error(f"寫入失敗: {e}")
+    
     # ==================== 用戶管理 ====================
     
     def create_or_update_user(self, user_id: int, username: str = None, 
@@ -129,8 +218,6 @@ class DatabaseManager:
                     last_active = CURRENT_TIMESTAMP
             ''', (user_id, username, first_name, last_name, language_code))
             
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             logger.error(f"創建/更新用戶失敗: {e}")
@@ -143,7 +230,6 @@ class DatabaseManager:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
             row = cursor.fetchone()
-            conn.close()
             
             if row:
                 return dict(row)
@@ -160,8 +246,6 @@ class DatabaseManager:
             cursor.execute('''
                 UPDATE users SET timezone = ? WHERE user_id = ?
             ''', (timezone, user_id))
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             logger.error(f"更新時區失敗: {e}")
@@ -170,9 +254,13 @@ class DatabaseManager:
     def init_user(self, user_id: int) -> bool:
         """初始化用戶（如果不存在則創建）"""
         try:
-            user = self.get_user(user_id)
-            if not user:
-                self.create_or_update_user(user_id)
+            # 單一語句完成「不存在才建立」，已存在的用戶資料不受影響
+            cursor = self.get_connection().execute('''
+                INSERT INTO users (user_id, last_active)
+                VALUES (?, CURRENT_TIMESTAMP)
+                ON CONFLICT(user_id) DO NOTHING
+            ''', (user_id,))
+            if cursor.rowcount > 0:
                 logger.info(f"初始化新用戶: {user_id}")
                 return True
             return False
@@ -180,6 +268,14 @@ class DatabaseManager:
             logger.error(f"初始化用戶失敗: {e}")
             raise
     
+    def init_user_async(self, user_id: int):
+        """初始化用戶（背景寫入，已存在則略過）"""
+        self.enqueue_write('''
+            INSERT INTO users (user_id, last_active)
+            VALUES (?, CURRENT_TIMESTAMP)
+            ON CONFLICT(user_id) DO NOTHING
+        ''', (user_id,))
+    
     def get_positions(self, user_id: int, status: str = 'open') -> List[Dict]:
         """獲取用戶的持倉
         
@@ -220,7 +316,6 @@ class DatabaseManager:
                         'profit_loss': row['profit_loss']
                     })
                 
-                conn.close()
                 return positions
                 
         except Exception as e:
@@ -259,32 +354,33 @@ class DatabaseManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # 將舊的風險屬性設為非當前
-            cursor.execute('''
-                UPDATE user_risk_profiles 
-                SET is_current = 0 
-                WHERE user_id = ? AND is_current = 1
-            ''', (user_id,))
-            
-            # 插入新的風險屬性
-            cursor.execute('''
-                INSERT INTO user_risk_profiles 
-                (user_id, risk_level, risk_score, max_loss_tolerance, notification_frequency)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (user_id, risk_level, risk_score, max_loss, notification_freq))
-            
-            profile_id = cursor.lastrowid
-            
-            # 保存問卷答案
-            for q_num, option, score in answers:
+            # 舊屬性停用、新屬性與問卷答案寫入須在同一交易中完成
+            with conn:
+                cursor.execute('BEGIN')
+                
+                # 將舊的風險屬性設為非當前
                 cursor.execute('''
-                    INSERT INTO risk_assessment_answers 
-                    (profile_id, question_number, answer_option, score)
-                    VALUES (?, ?, ?, ?)
-                ''', (profile_id, q_num, option, score))
-            
-            conn.commit()
-            conn.close()
+                    UPDATE user_risk_profiles 
+                    SET is_current = 0 
+                    WHERE user_id = ? AND is_current = 1
+                ''', (user_id,))
+                
+                # 插入新的風險屬性
+                cursor.execute('''
+                    INSERT INTO user_risk_profiles 
+                    (user_id, risk_level, risk_score, max_loss_tolerance, notification_frequency)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (user_id, risk_level, risk_score, max_loss, notification_freq))
+                
+                profile_id = cursor.lastrowid
+                
+                # 保存問卷答案
+                for q_num, option, score in answers:
+                    cursor.execute('''
+                        INSERT INTO risk_assessment_answers 
+                        (profile_id, question_number, answer_option, score)
+                        VALUES (?, ?, ?, ?)
+                    ''', (profile_id, q_num, option, score))
             logger.info(f"用戶 {user_id} 風險屬性已保存，等級: {risk_level}")
             return profile_id
         except Exception as e:
@@ -302,7 +398,6 @@ class DatabaseManager:
                 ORDER BY created_at DESC LIMIT 1
             ''', (user_id,))
             row = cursor.fetchone()
-            conn.close()
             
             if row:
                 return dict(row)
@@ -326,8 +421,6 @@ class DatabaseManager:
             ''', (user_id, symbol, entry_price, quantity, entry_reason))
             
             position_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
             return position_id
         except Exception as e:
             logger.error(f"新增持倉失敗: {e}")
@@ -364,8 +457,6 @@ class DatabaseManager:
                 WHERE position_id = ?
             ''', (exit_price, profit_loss, profit_loss_percent, exit_reason, position_id))
             
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             logger.error(f"關閉持倉失敗: {e}")
@@ -382,7 +473,6 @@ class DatabaseManager:
                 ORDER BY entry_time DESC
             ''', (user_id,))
             rows = cursor.fetchall()
-            conn.close()
             
             return [dict(row) for row in rows]
         except Exception as e:
@@ -408,8 +498,6 @@ class DatabaseManager:
                   volume_ratio, news_sentiment, recommendation, confidence))
             
             signal_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
             return signal_id
         except Exception as e:
             logger.error(f"保存交易信號失敗: {e}")
@@ -425,8 +513,6 @@ class DatabaseManager:
                 SET was_notified = 1 
                 WHERE signal_id = ?
             ''', (signal_id,))
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             logger.error(f"標記信號失敗: {e}")
@@ -448,8 +534,6 @@ class DatabaseManager:
             ''', (user_id, notification_type, symbol, message, priority))
             
             log_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
             return log_id
         except Exception as e:
             logger.error(f"記錄通知失敗: {e}")
@@ -465,7 +549,6 @@ class DatabaseManager:
                 WHERE user_id = ? AND DATE(sent_at) = DATE('now')
             ''', (user_id,))
             row = cursor.fetchone()
-            conn.close()
             
             return row['count'] if row else 0
         except Exception as e:
@@ -480,15 +563,20 @@ class DatabaseManager:
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
+            # 以單一語句檢查上限並寫入，避免先查後寫的競態
             cursor.execute('''
                 INSERT INTO market_watchlist 
                 (user_id, symbol, alert_type, alert_condition, threshold_value)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (user_id, symbol, alert_type, alert_condition, threshold_value))
+                SELECT ?, ?, ?, ?, ?
+                WHERE (SELECT COUNT(*) FROM market_watchlist WHERE user_id = ? AND is_active = 1) < ?
+            ''', (user_id, symbol, alert_type, alert_condition, threshold_value,
+                  user_id, self.MAX_WATCHLIST_PER_USER))
+            
+            if cursor.rowcount == 0:
+                logger.warning(f"用戶 {user_id} 監控項目已達上限 {self.MAX_WATCHLIST_PER_USER}")
+                return None
             
             watchlist_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
             return watchlist_id
         except Exception as e:
             logger.error(f"新增監控失敗: {e}")
@@ -504,7 +592,6 @@ class DatabaseManager:
                 WHERE user_id = ? AND is_active = 1
             ''', (user_id,))
             rows = cursor.fetchall()
-            conn.close()
             
             return [dict(row) for row in rows]
         except Exception as e:
@@ -512,6 +599,22 @@ class DatabaseManager:
             logger.error(f"獲取監控列表失敗: {e}")
             return []
 
+    def get_watched_symbols(self) -> List[str]:
+        """獲取所有活躍監控項目中的幣種（去重）"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT DISTINCT symbol FROM market_watchlist
+                WHERE is_active = 1
+            ''')
+            rows = cursor.fetchall()
+
+            return [row['symbol'] for row in rows]
+        except Exception as e:
+            logger.error(f"獲取監控幣種失敗: {e}")
+            return []
+
     def delete_watchlist_item(self, user_id: int, watchlist_id: int) -> bool:
         """刪除/停用監控項目"""
         try:
@@ -523,9 +626,7 @@ class DatabaseManager:
                 WHERE watchlist_id = ? AND user_id = ?
             ''', (watchlist_id, user_id))
             
-            conn.commit()
             success = cursor.rowcount > 0
-            conn.close()
             return success
         except Exception as e:
             logger.error(f"刪除監控失敗: {e}")
@@ -538,17 +639,45 @@ class DatabaseManager:
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO subscriptions (user_id, symbol, condition, created_at)
-                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (user_id, symbol.upper(), condition))
-            conn.commit()
-            conn.close()
-            return True
+            symbol = symbol.upper()
+            cursor.execute(self.UPSERT_SUBSCRIPTION_SQL, (
+                user_id, symbol, condition,
+                user_id, self.MAX_SUBSCRIPTIONS_PER_USER, user_id, symbol
+            ))
+            added = cursor.rowcount > 0
+            if not added:
+                logger.warning(f"用戶 {user_id} 訂閱數已達上限 {self.MAX_SUBSCRIPTIONS_PER_USER}")
+            return added
         except Exception as e:
             logger.error(f"添加訂閱失敗: {e}")
             return False
 
+    def add_subscriptions(self, user_id, rows) -> int:
+        """批量添加訂閱 (匯入 / 遷移用)
+        
+        Args:
+            user_id: 用戶 ID
+            rows: (幣種, 條件) 列表
+        
+        Returns:
+            實際寫入或更新的筆數，超過上限的幣種會被略過
+        """
+        params = [
+            (user_id, symbol.upper(), condition,
+             user_id, self.MAX_SUBSCRIPTIONS_PER_USER, user_id, symbol.upper())
+            for symbol, condition in rows
+        ]
+        try:
+            conn = self.get_connection()
+            # 單一交易內逐筆檢查上限，整批只提交一次
+            with conn:
+                conn.execute('BEGIN')
+                cursor = conn.executemany(self.UPSERT_SUBSCRIPTION_SQL, params)
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"批量添加訂閱失敗: {e}")
+            return 0
+
     def remove_subscription(self, user_id, symbol):
         """移除訂閱"""
         try:
@@ -558,9 +687,7 @@ class DatabaseManager:
                 DELETE FROM subscriptions 
                 WHERE user_id = ? AND symbol = ?
             ''', (user_id, symbol.upper()))
-            conn.commit()
             deleted = cursor.rowcount > 0
-            conn.close()
             return deleted
         except Exception as e:
             logger.error(f"移除訂閱失敗: {e}")
@@ -578,12 +705,39 @@ class DatabaseManager:
                 ORDER BY created_at DESC
             ''', (user_id,))
             rows = cursor.fetchall()
-            conn.close()
             return [dict(row) for row in rows]
         except Exception as e:
             logger.error(f"獲取用戶訂閱失敗: {e}")
             return []
 
+    def get_subscribed_symbols(self) -> List[str]:
+        """獲取所有訂閱中的幣種（去重）"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('SELECT DISTINCT symbol FROM subscriptions')
+            rows = cursor.fetchall()
+            return [row['symbol'] for row in rows]
+        except Exception as e:
+            logger.error(f"獲取訂閱幣種失敗: {e}")
+            return []
+
+    def get_subscribers_for_symbol(self, symbol):
+        """獲取訂閱指定幣種的用戶與條件"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT user_id, condition 
+                FROM subscriptions 
+                WHERE symbol = ?
+            ''', (symbol.upper(),))
+            rows = cursor.fetchall()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"獲取幣種訂閱者失敗: {e}")
+            return []
+
     def get_all_subscriptions(self):
         """獲取所有訂閱（用於監控）"""
         try:
@@ -594,7 +748,6 @@ class DatabaseManager:
                 FROM subscriptions
             ''')
             rows = cursor.fetchall()
-            conn.close()
             return [dict(row) for row in rows]
         except Exception as e:
             logger.error(f"獲取所有訂閱失敗: {e}")
@@ -616,8 +769,6 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (symbol, price, volume_24h, price_change_24h, rsi_14, ma_50, ma_200, news_sentiment))
             
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             logger.error(f"保存市場快照失敗: {e}")
@@ -634,7 +785,6 @@ class DatabaseManager:
                 ORDER BY captured_at DESC LIMIT 1
             ''', (symbol,))
             row = cursor.fetchone()
-            conn.close()
             
             if row:
                 return dict(row)
@@ -662,7 +812,6 @@ class DatabaseManager:
             ''', (user_id,))
             stats = dict(cursor.fetchone())
             
-            conn.close()
             return stats
         except Exception as e:
             logger.error(f"獲取績效統計失敗: {e}")
@@ -5,6 +5,7 @@
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 import pandas as pd
+import numpy as np
 from datetime import datetime
 from typing import Dict, Optional
 import logging
@@ -173,8 +174,11 @@ class MarketAnalyzer:
         Returns:
             波動率（百分比）
         """
-        returns = df['close'].pct_change()
-        volatility = returns.rolling(window=window).std().iloc[-1]
+        # 只需要最後一個窗口的標準差，不必計算整段 rolling
+        returns = df['close'].pct_change().to_numpy()
+        if len(returns) < window:
+            return float('nan')
+        volatility = float(np.std(returns[-window:], ddof=1))
         return volatility
     
     def check_market_conditions(self) -> Dict:
@@ -196,7 +200,7 @@ class MarketAnalyzer:
             market_status = {
                 'timestamp': datetime.now().isoformat(),
                 'symbol': self.symbol,
-                'current_price': df.iloc[-1]['close'],
+                'current_price': df['close'].iat[-1],
                 'price_change_24h': stats_24h['price_change_percent'],
                 'volume_24h': stats_24h['volume'],
                 'volatility': round(volatility * 100, 2),  # 轉換為百分比
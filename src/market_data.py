@@ -9,41 +9,97 @@
 - 恐慌與貪婪指數
 """
 
+import functools
+import os
+import threading
+import time
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
+from types import MappingProxyType
 from typing import Dict, List, Optional
 
+# 查詢結果快取 ((方法名稱, 參數...) -> (快取時間, 結果))，降低觸發 CoinGecko 限流的機會
+# 價格類查詢最多每分鐘更新一次；市場總覽與恐懼貪婪指數變化較慢
+PRICE_CACHE_TTL = int(os.getenv('CACHE_TTL_SECONDS', 60))
+MARKET_CACHE_TTL = 300
+MARKET_CACHE_MAXSIZE = 256
+_market_cache = {}
+_market_cache_lock = threading.Lock()
+
+
+def _ttl_cached(ttl):
+    """快取查詢結果 ttl 秒；查詢失敗時沿用過期的舊資料 (stale-while-error)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = (func.__name__, *(tuple(a) if isinstance(a, list) else a for a in args),
+                   *sorted(kwargs.items()))
+            with _market_cache_lock:
+                cached = _market_cache.get(key)
+            if cached and time.monotonic() - cached[0] < ttl:
+                return cached[1]
+            
+            # 網路請求不持有鎖，避免慢速查詢阻塞其他查詢
+            result = func(self, *args, **kwargs)
+            if not result:
+                return cached[1] if cached else result
+            
+            with _market_cache_lock:
+                if len(_market_cache) >= MARKET_CACHE_MAXSIZE and key not in _market_cache:
+                    # 移除最早寫入的項目
+                    _market_cache.pop(next(iter(_market_cache)))
+                _market_cache[key] = (time.monotonic(), result)
+            return result
+        return wrapper
+    return decorator
+
+
+# 常用幣種映射 (方便用戶輸入)，所有實例共用且唯讀
+SYMBOL_MAP = MappingProxyType({
+    'BTC': 'bitcoin',
+    'ETH': 'ethereum',
+    'BNB': 'binancecoin',
+    'SOL': 'solana',
+    'XRP': 'ripple',
+    'ADA': 'cardano',
+    'DOGE': 'dogecoin',
+    'DOT': 'polkadot',
+    'MATIC': 'matic-network',
+    'AVAX': 'avalanche-2',
+    'LINK': 'chainlink',
+    'UNI': 'uniswap',
+    'ATOM': 'cosmos',
+    'LTC': 'litecoin',
+    'BCH': 'bitcoin-cash',
+})
+
+
 class MarketDataAPI:
     """市場數據 API 客戶端"""
     
+    symbol_map = SYMBOL_MAP
+    
     def __init__(self):
         self.coingecko_base = "https://api.coingecko.com/api/v3"
         self.fear_greed_url = "https://api.alternative.me/fng/"
         
-        # 常用幣種映射 (方便用戶輸入)
-        self.symbol_map = {
-            'BTC': 'bitcoin',
-            'ETH': 'ethereum',
-            'BNB': 'binancecoin',
-            'SOL': 'solana',
-            'XRP': 'ripple',
-            'ADA': 'cardano',
-            'DOGE': 'dogecoin',
-            'DOT': 'polkadot',
-            'MATIC': 'matic-network',
-            'AVAX': 'avalanche-2',
-            'LINK': 'chainlink',
-            'UNI': 'uniswap',
-            'ATOM': 'cosmos',
-            'LTC': 'litecoin',
-            'BCH': 'bitcoin-cash',
-        }
+        # 共用 HTTP Session (keep-alive 連線池，避免每次請求重新 TCP + TLS 握手)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+        ))
     
     def get_coin_id(self, symbol: str) -> str:
         """將幣種代碼轉換為 CoinGecko ID"""
         symbol = symbol.upper()
         return self.symbol_map.get(symbol, symbol.lower())
     
+    @_ttl_cached(PRICE_CACHE_TTL)
     def get_price(self, symbol: str) -> Optional[Dict]:
         """
         查詢單一幣種價格
@@ -66,9 +122,9 @@ class MarketDataAPI:
                 'sparkline': 'false'
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
             # 提取關鍵資訊
             market_data = data.get('market_data', {})
@@ -94,6 +150,7 @@ class MarketDataAPI:
             print(f"❌ 處理 {symbol} 數據時出錯: {e}")
             return None
     
+    @_ttl_cached(PRICE_CACHE_TTL)
     def get_multiple_prices(self, symbols: List[str]) -> Dict[str, Dict]:
         """
         批量查詢多個幣種價格
@@ -118,9 +175,9 @@ class MarketDataAPI:
                 'include_market_cap': 'true',
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
             # 整理結果
             results = {}
@@ -140,6 +197,7 @@ class MarketDataAPI:
             print(f"❌ 批量查詢價格失敗: {e}")
             return {}
     
+    @_ttl_cached(MARKET_CACHE_TTL)
     def get_market_overview(self) -> Optional[Dict]:
         """
         獲取市場總覽數據
@@ -149,9 +207,9 @@ class MarketDataAPI:
         """
         try:
             url = f"{self.coingecko_base}/global"
-            response = requests.get(url, timeout=10)
+            response = self.session.get(url, timeout=10)
             response.raise_for_status()
-            data = response.json().get('data', {})
+            data = orjson.loads(response.content).get('data', {})
             
             return {
                 'total_market_cap': data.get('total_market_cap', {}).get('usd'),
@@ -167,6 +225,7 @@ class MarketDataAPI:
             print(f"❌ 獲取市場總覽失敗: {e}")
             return None
     
+    @_ttl_cached(MARKET_CACHE_TTL)
     def get_fear_greed_index(self) -> Optional[Dict]:
         """
         獲取恐慌與貪婪指數
@@ -175,9 +234,9 @@ class MarketDataAPI:
             恐慌指數數據
         """
         try:
-            response = requests.get(self.fear_greed_url, timeout=10)
+            response = self.session.get(self.fear_greed_url, timeout=10)
             response.raise_for_status()
-            data = response.json().get('data', [{}])[0]
+            data = orjson.loads(response.content).get('data', [{}])[0]
             
             value = int(data.get('value', 0))
             classification = data.get('value_classification', 'Unknown')
@@ -192,6 +251,7 @@ class MarketDataAPI:
             print(f"❌ 獲取恐慌指數失敗: {e}")
             return None
     
+    @_ttl_cached(PRICE_CACHE_TTL)
     def get_top_coins(self, limit: int = 10) -> List[Dict]:
         """
         獲取市值排名前 N 的幣種
@@ -212,9 +272,9 @@ class MarketDataAPI:
                 'sparkline': 'false',
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
             results = []
             for coin in data:
@@ -299,14 +359,14 @@ class MarketDataFormatter:
         if not data:
             return "❌ 查詢失敗"
         
-        msg = "<b>💰 主流幣種價格</b>\n\n"
+        parts = ["<b>💰 主流幣種價格</b>\n\n"]
         
         for symbol, coin_data in data.items():
             price = MarketDataFormatter.format_price(coin_data.get('price_usd'))
             change = MarketDataFormatter.format_percentage(coin_data.get('price_change_24h'))
-            msg += f"<b>{symbol}</b>: {price} {change}\n"
+            parts.append(f"<b>{symbol}</b>: {price} {change}\n")
         
-        return msg
+        return "".join(parts)
     
     @staticmethod
     def format_market_overview(data: Dict, fear_greed: Optional[Dict] = None) -> str:
@@ -350,7 +410,7 @@ class MarketDataFormatter:
         if not coins:
             return "❌ 查詢失敗"
         
-        msg = "<b>🏆 市值排行榜 Top 10</b>\n\n"
+        parts = ["<b>🏆 市值排行榜 Top 10</b>\n\n"]
         
         for coin in coins:
             rank = coin['rank']
@@ -359,10 +419,10 @@ class MarketDataFormatter:
             price = MarketDataFormatter.format_price(coin['price_usd'])
             change = MarketDataFormatter.format_percentage(coin['price_change_24h'])
             
-            msg += f"{rank}. <b>{symbol}</b> ({name})\n"
-            msg += f"   {price} {change}\n\n"
+            parts.append(f"{rank}. <b>{symbol}</b> ({name})\n")
+            parts.append(f"   {price} {change}\n\n")
         
-        return msg
+        return "".join(parts)
 
 
 # 使用範例
@@ -5,8 +5,12 @@
 import logging
 import threading
 import time
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from types import MappingProxyType
 from typing import Dict, List, Optional
 import pytz
 from .database import db
@@ -14,18 +18,38 @@ from .trading_strategy import trading_strategy
 
 logger = logging.getLogger(__name__)
 
+# 同時抓取市場數據的幣種數
+MARKET_FETCH_WORKERS = 6
+
+# 交易對 -> CoinGecko ID (唯讀，載入時建立一次)
+PAIR_TO_COINGECKO_ID = MappingProxyType({
+    'BTC/USDT': 'bitcoin',
+    'ETH/USDT': 'ethereum',
+    'BNB/USDT': 'binancecoin',
+    'SOL/USDT': 'solana',
+    'XRP/USDT': 'ripple'
+})
+
 
 class MarketMonitor:
     """市場監控類"""
     
     def __init__(self, bot_token: str):
         self.bot_token = bot_token
+        self._send_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
         self.is_running = False
         self.monitor_thread = None
         self.check_interval = 300  # 5分鐘檢查一次
         
         # 預設監控幣種
         self.default_symbols = ['BTC/USDT', 'ETH/USDT']
+        
+        # 各幣種的市場數據互不相依，共用執行緒池並行抓取
+        self._fetch_pool = ThreadPoolExecutor(max_workers=MARKET_FETCH_WORKERS, thread_name_prefix='market')
+        
+        # 共用 HTTP Session (keep-alive 連線池，避免每次請求重新 TCP + TLS 握手)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=10))
     
     def start(self):
         """啟動監控"""
@@ -121,12 +145,14 @@ class MarketMonitor:
         try:
             positions = db.get_open_positions(user_id)
             
-            for position in positions:
-                symbol = position['symbol']
+            # 並行獲取各持倉的當前市場數據，依持倉順序處理
+            all_market_data = self._fetch_pool.map(
+                self._fetch_market_data, [position['symbol'] for position in positions]
+            )
+            
+            for position, market_data in zip(positions, all_market_data):
                 position_id = position['position_id']
                 
-                # 獲取當前市場數據
-                market_data = self._fetch_market_data(symbol)
                 if not market_data:
                     continue
                 
@@ -164,9 +190,8 @@ class MarketMonitor:
             else:
                 symbols = [item['symbol'] for item in watchlist]
             
-            for symbol in symbols:
-                # 獲取市場數據
-                market_data = self._fetch_market_data(symbol)
+            # 並行獲取市場數據，依監控列表順序處理
+            for symbol, market_data in zip(symbols, self._fetch_pool.map(self._fetch_market_data, symbols)):
                 if not market_data:
                     continue
                 
@@ -237,14 +262,7 @@ class MarketMonitor:
     
     def _symbol_to_coingecko_id(self, symbol: str) -> str:
         """交易對轉換為 CoinGecko ID"""
-        mapping = {
-            'BTC/USDT': 'bitcoin',
-            'ETH/USDT': 'ethereum',
-            'BNB/USDT': 'binancecoin',
-            'SOL/USDT': 'solana',
-            'XRP/USDT': 'ripple'
-        }
-        return mapping.get(symbol, 'bitcoin')
+        return PAIR_TO_COINGECKO_ID.get(symbol, 'bitcoin')
     
     def _fetch_coingecko_data(self, coin_id: str) -> Dict:
         """從 CoinGecko 獲取數據"""
@@ -257,9 +275,9 @@ class MarketMonitor:
                 'sparkline': False
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 if data:
                     return data[0]
             
@@ -343,17 +361,20 @@ class MarketMonitor:
                                  entry_signal: Dict, market_data: Dict):
         """發送進場通知"""
         try:
-            message = f"🚀 進場機會提醒\n\n"
-            message += f"幣種: {symbol}\n"
-            message += f"當前價格: ${market_data['price']:,.2f}\n"
-            message += f"策略: {entry_signal['strategy_name']}\n"
-            message += f"信心度: {entry_signal['confidence']*100:.0f}%\n\n"
-            message += "📊 分析依據:\n"
+            parts = [
+                "🚀 進場機會提醒\n\n",
+                f"幣種: {symbol}\n",
+                f"當前價格: ${market_data['price']:,.2f}\n",
+                f"策略: {entry_signal['strategy_name']}\n",
+                f"信心度: {entry_signal['confidence']*100:.0f}%\n\n",
+                "📊 分析依據:\n",
+            ]
             
             for reason in entry_signal['reasons'][:5]:  # 最多顯示5個原因
-                message += f"{reason}\n"
+                parts.append(f"{reason}\n")
             
-            message += f"\n{entry_signal['recommendation']}"
+            parts.append(f"\n{entry_signal['recommendation']}")
+            message = "".join(parts)
             
             # 發送 Telegram 訊息
             self._send_telegram_message(user_id, message)
@@ -382,17 +403,20 @@ class MarketMonitor:
             
             emoji = exit_type_emoji.get(exit_signal['exit_type'], '⚠️')
             
-            message = f"{emoji} 退場信號提醒\n\n"
-            message += f"幣種: {position['symbol']}\n"
-            message += f"進場價: ${position['entry_price']:,.2f}\n"
-            message += f"當前價: ${current_price:,.2f}\n"
-            message += f"損益: {exit_signal['current_pl']:+.2f}%\n\n"
-            message += "📊 退場原因:\n"
+            parts = [
+                f"{emoji} 退場信號提醒\n\n",
+                f"幣種: {position['symbol']}\n",
+                f"進場價: ${position['entry_price']:,.2f}\n",
+                f"當前價: ${current_price:,.2f}\n",
+                f"損益: {exit_signal['current_pl']:+.2f}%\n\n",
+                "📊 退場原因:\n",
+            ]
             
             for reason in exit_signal['reasons']:
-                message += f"{reason}\n"
+                parts.append(f"{reason}\n")
             
-            message += f"\n{exit_signal['recommendation']}"
+            parts.append(f"\n{exit_signal['recommendation']}")
+            message = "".join(parts)
             
             # 發送 Telegram 訊息
             self._send_telegram_message(user_id, message)
@@ -419,26 +443,28 @@ class MarketMonitor:
             # 獲取持倉狀況
             positions = db.get_open_positions(user_id)
             
-            message = "📊 每日投資摘要\n\n"
-            message += f"時間: {datetime.now(pytz.timezone(timezone)).strftime('%Y-%m-%d %H:%M')}\n\n"
-            
-            message += "💼 持倉狀況:\n"
+            parts = [
+                "📊 每日投資摘要\n\n",
+                f"時間: {datetime.now(pytz.timezone(timezone)).strftime('%Y-%m-%d %H:%M')}\n\n",
+                "💼 持倉狀況:\n",
+            ]
             if positions:
                 for pos in positions:
                     symbol = pos['symbol']
                     entry_price = pos['entry_price']
                     # 需要獲取當前價格計算損益
-                    message += f"  • {symbol}: ${entry_price:,.2f}\n"
+                    parts.append(f"  • {symbol}: ${entry_price:,.2f}\n")
             else:
-                message += "  無持倉\n"
+                parts.append("  無持倉\n")
             
-            message += f"\n📈 績效統計:\n"
+            parts.append("\n📈 績效統計:\n")
             if performance.get('total_trades', 0) > 0:
-                message += f"  • 總交易: {performance['total_trades']} 筆\n"
-                message += f"  • 勝率: {performance['winning_trades']/performance['total_trades']*100:.1f}%\n"
-                message += f"  • 平均報酬: {performance.get('avg_return', 0):.2f}%\n"
+                parts.append(f"  • 總交易: {performance['total_trades']} 筆\n")
+                parts.append(f"  • 勝率: {performance['winning_trades']/performance['total_trades']*100:.1f}%\n")
+                parts.append(f"  • 平均報酬: {performance.get('avg_return', 0):.2f}%\n")
             else:
-                message += "  尚無交易記錄\n"
+                parts.append("  尚無交易記錄\n")
+            message = "".join(parts)
             
             # 發送訊息（優先級較低）
             self._send_telegram_message(user_id, message)
@@ -457,13 +483,17 @@ class MarketMonitor:
     def _send_telegram_message(self, user_id: int, message: str):
         """發送 Telegram 訊息"""
         try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
             data = {
                 'chat_id': user_id,
                 'text': message
             }
             
-            response = requests.post(url, json=data, timeout=10)
+            response = self.session.post(
+                self._send_url,
+                data=orjson.dumps(data),
+                headers={'Content-Type': 'application/json'},
+                timeout=10
+            )
             if response.status_code != 200:
                 logger.error(f"發送訊息失敗: {response.text}")
         
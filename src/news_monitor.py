@@ -2,13 +2,24 @@
 新聞監控模組 - 多來源抓取、智能去重、頻率控制
 """
 import os
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import hashlib
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from pathlib import Path
 
+# 同時抓取的新聞來源數 (CryptoPanic + RSS)
+NEWS_FETCH_WORKERS = 5
+
+# 標題正規化用的預編譯正則
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+SEEN_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
 class NewsMonitor:
     """加密貨幣新聞監控器"""
 
@@ -19,6 +30,13 @@ class NewsMonitor:
         self.seen_news = self._load_seen_news()
         self.max_alert_count = 5  # 每則新聞最多提醒 5 次
 
+        # 共用 HTTP Session (keep-alive 連線池，每個來源各保留一條連線)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=NEWS_FETCH_WORKERS,
+            pool_maxsize=NEWS_FETCH_WORKERS
+        ))
+
         # CryptoPanic API (免費，無需註冊)
         self.cryptopanic_url = 'https://cryptopanic.com/api/v1/posts/'
 
@@ -52,20 +70,22 @@ class NewsMonitor:
     def _generate_news_hash(self, title):
         """生成新聞的唯一識別碼 (基於標題)"""
         # 清理標題：移除特殊字符、轉小寫、標準化空白
-        clean_title = re.sub(r'[^\w\s]', '', title.lower())
-        clean_title = re.sub(r'\s+', ' ', clean_title).strip()
+        clean_title = _NON_WORD_RE.sub('', title.lower())
+        clean_title = _WHITESPACE_RE.sub(' ', clean_title).strip()
 
         # 使用前 100 個字符生成 MD5 hash
         news_hash = hashlib.md5(clean_title[:100].encode()).hexdigest()[:12]
         return news_hash
 
-    def _is_news_seen(self, news_hash, title):
-        """檢查新聞是否已經看過，並更新計數"""
+    def _is_news_seen(self, news_hash, title, seen_at=None):
+        """檢查新聞是否已經看過，並更新計數 (seen_at 為批次共用的時間字串)"""
+        if seen_at is None:
+            seen_at = datetime.now().strftime(SEEN_TIME_FORMAT)
         if news_hash not in self.seen_news:
             # 新新聞
             self.seen_news[news_hash] = {
                 'title': title,
-                'last_seen': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'last_seen': seen_at,
                 'count': 1
             }
             return False
@@ -80,7 +100,7 @@ class NewsMonitor:
 
         # 更新計數和時間
         news_info['count'] += 1
-        news_info['last_seen'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        news_info['last_seen'] = seen_at
         print(f"   📊 新聞重複出現 (第 {news_info['count']} 次): {title[:50]}...")
         return True
 
@@ -95,9 +115,9 @@ class NewsMonitor:
                 'filter': 'important'  # 只抓取重要新聞
             }
 
-            response = requests.get(self.cryptopanic_url, params=params, timeout=10)
+            response = self.session.get(self.cryptopanic_url, params=params, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
 
             for item in data.get('results', [])[:10]:  # 只取前 10 則
                 news_list.append({
@@ -121,7 +141,9 @@ class NewsMonitor:
         try:
             import feedparser
 
-            feed = feedparser.parse(rss_url)
+            response = self.session.get(rss_url, timeout=10)
+            response.raise_for_status()
+            feed = feedparser.parse(response.content)
 
             for entry in feed.entries[:10]:  # 只取前 10 則
                 news_list.append({
@@ -139,18 +161,36 @@ class NewsMonitor:
 
         return news_list
 
+    def _submit_fetches(self, executor):
+        """把每個新聞來源的抓取工作交給執行緒池，依來源順序回傳 futures"""
+        futures = [executor.submit(self._fetch_cryptopanic)]
+        for source_name, rss_url in self.rss_sources.items():
+            futures.append(executor.submit(self._fetch_rss, source_name, rss_url))
+        return futures
+
+    def iter_news(self):
+        """依來源完成的先後逐則產出新聞
+
+        呼叫端湊滿所需數量即可停止迭代，不必等待較慢的來源
+        """
+        executor = ThreadPoolExecutor(max_workers=NEWS_FETCH_WORKERS, thread_name_prefix='news')
+        try:
+            for future in as_completed(self._submit_fetches(executor)):
+                yield from future.result()
+        finally:
+            # 提前結束時取消尚未開始的抓取，不等待進行中的請求
+            executor.shutdown(wait=False, cancel_futures=True)
+
     def fetch_all_news(self):
-        """從所有來源抓取新聞"""
+        """從所有來源抓取新聞 (各來源並行抓取，結果依來源順序排列)"""
         all_news = []
 
         print("\n📡 開始抓取新聞...")
 
-        # 1. CryptoPanic
-        all_news.extend(self._fetch_cryptopanic())
-
-        # 2. RSS 來源
-        for source_name, rss_url in self.rss_sources.items():
-            all_news.extend(self._fetch_rss(source_name, rss_url))
+        with ThreadPoolExecutor(max_workers=NEWS_FETCH_WORKERS, thread_name_prefix='news') as executor:
+            # 1. CryptoPanic  2. RSS 來源
+            for future in self._submit_fetches(executor):
+                all_news.extend(future.result())
 
         print(f"\n📊 總共抓取 {len(all_news)} 則新聞")
 
@@ -160,6 +200,9 @@ class NewsMonitor:
         """過濾出新新聞 (去重 + 頻率控制)"""
         new_news = []
 
+        # 同一批新聞共用一次時間格式化
+        seen_at = datetime.now().strftime(SEEN_TIME_FORMAT)
+
         for news in news_list:
             title = news['title']
             if not title:
@@ -167,7 +210,7 @@ class NewsMonitor:
 
             news_hash = self._generate_news_hash(title)
 
-            if not self._is_news_seen(news_hash, title):
+            if not self._is_news_seen(news_hash, title, seen_at):
                 new_news.append(news)
 
         # 保存記錄
@@ -206,23 +249,25 @@ class NewsMonitor:
         if not news_list:
             return None
 
-        message = "🚨 加密貨幣新聞警報 🚨\n\n"
-        message += f"檢測到 {len(news_list)} 則新新聞：\n"
-        message += "─" * 40 + "\n\n"
+        parts = [
+            "🚨 加密貨幣新聞警報 🚨\n\n",
+            f"檢測到 {len(news_list)} 則新新聞：\n",
+            "─" * 40 + "\n\n",
+        ]
 
         for i, news in enumerate(news_list[:5], 1):  # 最多顯示 5 則
-            message += f"{i}. 📰 {news['title']}\n"
-            message += f"   🏢 來源：{news['source']}\n"
+            parts.append(f"{i}. 📰 {news['title']}\n")
+            parts.append(f"   🏢 來源：{news['source']}\n")
             if news.get('published'):
-                message += f"   📅 時間：{news['published']}\n"
+                parts.append(f"   📅 時間：{news['published']}\n")
             if news.get('summary'):
-                message += f"   📝 {news['summary'][:150]}...\n"
-            message += f"   🔗 {news['url']}\n\n"
+                parts.append(f"   📝 {news['summary'][:150]}...\n")
+            parts.append(f"   🔗 {news['url']}\n\n")
 
         if len(news_list) > 5:
-            message += f"\n... 還有 {len(news_list) - 5} 則新聞"
+            parts.append(f"\n... 還有 {len(news_list) - 5} 則新聞")
 
-        return message
+        return "".join(parts)
 
 
 # 獨立執行測試
@@ -6,7 +6,9 @@ import os
 from datetime import datetime
 from typing import Dict, Optional
 import logging
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,6 +32,11 @@ class TelegramNotifier:
         # 從環境變數或參數獲取憑證
         self.bot_token = bot_token or os.getenv('TELEGRAM_BOT_TOKEN')
         self.chat_id = chat_id or os.getenv('TELEGRAM_CHAT_ID')
+        self._send_url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        
+        # 共用 HTTP Session (keep-alive 連線池，避免每次請求重新 TCP + TLS 握手)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=10))
         
         if not self.bot_token or not self.chat_id:
             logger.warning("Telegram 憑證未設定，通知功能將無法使用")
@@ -51,8 +58,6 @@ class TelegramNotifier:
             logger.error("Telegram 憑證未設定")
             return False
         
-        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-        
         payload = {
             'chat_id': self.chat_id,
             'text': message,
@@ -61,7 +66,12 @@ class TelegramNotifier:
         }
         
         try:
-            response = requests.post(url, json=payload, timeout=10)
+            response = self.session.post(
+                self._send_url,
+                data=orjson.dumps(payload),
+                headers={'Content-Type': 'application/json'},
+                timeout=10
+            )
             response.raise_for_status()
             logger.info("Telegram 訊息發送成功")
             return True
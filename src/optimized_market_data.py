@@ -9,6 +9,7 @@
 - ✅ 超時控制和錯誤處理
 """
 
+import orjson
 import requests
 from datetime import datetime
 from typing import Dict, List, Optional
@@ -72,7 +73,7 @@ class MarketDataAPI:
         """
         response = self.session.get(url, params=params, timeout=timeout)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def get_price(self, symbol: str) -> Optional[Dict]:
         """
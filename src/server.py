@@ -14,13 +14,26 @@ Telegram Bot Webhook Server - V2.0 智能加密貨幣投資助手
 - 智能新聞情緒分析算法
 - Webhook 即時通知
 """
-from flask import Flask, request, jsonify
+from flask import Flask, request
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import atexit
+import functools
+import hashlib
 import os
 import logging
+import queue
+import re
+import threading
+import time
+from collections import deque
+from io import BytesIO
+from xml.etree import ElementTree
 from datetime import datetime
 import feedparser
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait as wait_futures, TimeoutError as FutureTimeoutError
 from .database import db
 
 # 配置日誌
@@ -30,22 +43,99 @@ app = Flask(__name__)
 
 # 環境變數
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+SEND_MESSAGE_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
 COINGECKO_API_KEY = os.getenv('COINGECKO_API_KEY', '')
 
+# CoinGecko 請求標頭（API Key 於載入時決定，不必每次請求重建）
+COINGECKO_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+if COINGECKO_API_KEY:
+    COINGECKO_HEADERS['x-cg-demo-api-key'] = COINGECKO_API_KEY
+
 # 初始化市場監控 (Global variable to hold the monitor instance)
 monitor = None
 
 def init_app_monitor():
     global monitor
+    start_price_refresher()
     if TELEGRAM_BOT_TOKEN:
         monitor = init_monitor(TELEGRAM_BOT_TOKEN)
         monitor.start()
     else:
         logger.warning("TELEGRAM_BOT_TOKEN 未設置，監控功能未啟動")
 
+# 共用 HTTP Session (keep-alive 連線池，避免每次請求重新 TCP + TLS 握手)
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 502, 503])
+)
+# 所有 HTTPS 主機 (CoinGecko、Telegram、Binance、RSS) 共用同一組連線池設定
+SESSION.mount('https://', _adapter)
+
+# 價格查詢共用執行緒池（避免每次查詢重新建立執行緒）
+PRICE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='price')
+
+# RSS 抓取共用執行緒池（常駐，所有新聞源可同時抓取）
+FEED_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='feed')
+atexit.register(FEED_POOL.shutdown, wait=False, cancel_futures=True)
+
+# Webhook 指令處理執行緒池（Webhook 立即回應，指令於背景處理）
+WEBHOOK_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix='webhook')
+
+# Telegram 發送佇列：尖峰時段將同一聊天的連續訊息合併後再發送
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+TELEGRAM_BAD_REQUEST = 400
+MESSAGE_SEPARATOR = "\n\n"
+OUTBOX_DEBOUNCE_SECONDS = 0.03
+TELEGRAM_TIMEOUT = (3, 5)   # (連線, 讀取) 秒數，快速失敗以釋放發送執行緒
+_OUT_Q = queue.Queue()
+_outbox_thread = None
+_outbox_lock = threading.Lock()
+SEND_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='telegram')
+# 各聊天待發送的訊息 (chat_id -> deque)；同一聊天同時只有一個發送任務，確保送達順序
+_chat_outbox = {}
+_chat_outbox_lock = threading.Lock()
+
+# Telegram 全 Bot 發送速率上限 (則/秒)：令牌桶於客戶端限速，避免尖峰時觸發 429
+TELEGRAM_RATE_LIMIT = 30
+_send_tokens = float(TELEGRAM_RATE_LIMIT)
+_send_tokens_ts = time.monotonic()
+_send_rate_lock = threading.Lock()
+
 # 用戶時區存儲（現在使用資料庫）
 user_timezones = {}
 
+# 用戶資料快取 (user_id -> (快取時間, 用戶資料))，減少重複的資料庫讀取
+USER_CACHE_TTL = 60
+USER_CACHE_MAXSIZE = 1024
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+# CoinGecko 超過此秒數未回應時，同時向 Binance 發出備援請求
+PRICE_HEDGE_DELAY = 0.3
+
+# 價格快取 (輸入/cg_id -> (快取時間, 價格資料))，'btc' 與 'bitcoin' 共用同一筆
+PRICE_TTL = int(os.getenv('CACHE_TTL_SECONDS', 45))
+PRICE_CACHE_MAXSIZE = 256
+_price_cache = {}
+_price_cache_lock = threading.RLock()
+_price_cache_pruned = 0.0
+
+# 背景價格表 (cg_id -> (更新時間, 價格資料))，由背景執行緒定期批量刷新
+PRICE_REFRESH_INTERVAL = 30
+PRICE_MAP_MAX_AGE = PRICE_REFRESH_INTERVAL * 2   # 刷新停擺時不使用過舊的價格
+PRICE_MAP = {}
+_price_map_lock = threading.RLock()
+_price_refresher_thread = None
+
+# /top 訊息快取 (市值排名以分鐘為單位變動，所有用戶共用同一份)
+TOP_CACHE_TTL = 30
+_TOP_CACHE = {'ts': 0, 'msg': None}
+_top_cache_lock = threading.Lock()
+
 # RSS 新聞來源
 NEWS_FEEDS = {
     'zh': [
@@ -58,30 +148,261 @@ NEWS_FEEDS = {
     ]
 }
 
+# RSS 解析結果快取 (url -> {'ts', 'entries', 'etag', 'modified'})
+FEED_CACHE_TTL = 60
+FEED_TIMEOUT = (3, 4)       # 單一 RSS 請求的 (連線, 讀取) 秒數
+FEED_DEADLINE = 6           # /news、/trend 等待所有新聞源的總時限
+FEED_ENTRY_LIMIT = 5        # 每個源最多解析幾條
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+_feed_cache = {}
+_feed_cache_lock = threading.Lock()
+
+# 新聞情緒關鍵字（載入時即轉為小寫）
+POSITIVE_KEYWORDS = tuple(keyword.lower() for keyword in (
+    'surge', 'rally', 'bullish', 'growth', 'adoption', 'breakthrough',
+    '上漲', '看漲', '突破', '增長', '採用', '利好', '暴漲', '飆升',
+))
+NEGATIVE_KEYWORDS = tuple(keyword.lower() for keyword in (
+    'crash', 'drop', 'bearish', 'decline', 'ban', 'hack', 'scam',
+    '下跌', '看跌', '暴跌', '禁令', '駭客', '騙局', '崩盤',
+))
+# 單次掃描即可找出標題中所有關鍵字（長詞優先，避免被較短的詞先匹配）
+_POSITIVE_RE = re.compile('|'.join(map(re.escape, sorted(POSITIVE_KEYWORDS, key=len, reverse=True))))
+_NEGATIVE_RE = re.compile('|'.join(map(re.escape, sorted(NEGATIVE_KEYWORDS, key=len, reverse=True))))
+
+NEWS_LIMIT = 5            # /news 最多顯示幾條
+NEWS_PER_FEED = 3         # 每個源最多取幾條
+
+
+# 常見幣種映射表 (Ticker -> CoinGecko ID)
+# 用戶輸入可能是 ticker (btc) 也可能是 id (bitcoin)
+TICKER_MAP = {
+    'btc': 'bitcoin',
+    'eth': 'ethereum',
+    'sol': 'solana',
+    'bnb': 'binancecoin',
+    'xrp': 'ripple',
+    'ada': 'cardano',
+    'doge': 'dogecoin',
+    'avax': 'avalanche-2',
+    'dot': 'polkadot',
+    'matic': 'matic-network',
+    'link': 'chainlink',
+    'ltc': 'litecoin',
+    'uni': 'uniswap',
+    'atom': 'cosmos',
+    'etc': 'ethereum-classic',
+    'xlm': 'stellar',
+    'trx': 'tron',
+    'busd': 'binance-usd',
+    'shib': 'shiba-inu'
+}
+
+# /top 備用方案顯示的主要幣種 (Ticker, 名稱)
+FALLBACK_TOP_COINS = (
+    ('BTC', 'Bitcoin'), ('ETH', 'Ethereum'), ('BNB', 'BNB'),
+    ('SOL', 'Solana'), ('XRP', 'XRP'), ('DOGE', 'Dogecoin'),
+    ('ADA', 'Cardano'), ('AVAX', 'Avalanche'), ('TRX', 'TRON'), ('DOT', 'Polkadot'),
+)
+FALLBACK_TOP_SYMBOLS = tuple(symbol for symbol, _ in FALLBACK_TOP_COINS)
+
+# /top 單一幣種的訊息區塊 (CoinGecko 與備用方案共用)
+TOP_COIN_TEMPLATE = "{rank}. <b>{name}</b> ({symbol})\n   ${price:,.2f} {emoji} {change:+.2f}%\n\n"
+
+# 啟動時預載的 ticker -> CoinGecko ID 索引 (市值前 SYMBOL_INDEX_SIZE 名)，
+# 讓 TICKER_MAP 以外的幣種也能直接查到 ID；同名 ticker 以市值較高者為準
+SYMBOL_INDEX_SIZE = 250
+SYMBOL_INDEX = {}
 
-def send_message(chat_id, text, parse_mode='HTML'):
-    """發送 Telegram 訊息"""
+# 反向映射 (CoinGecko ID -> Ticker)，只在載入時建一次
+ID_TO_TICKER = {v: k for k, v in TICKER_MAP.items()}
+
+# Binance 交易對映射：ticker 與 ID 都直接對應到 'BTCUSDT' 這類 symbol
+BINANCE_PAIR_MAP = {
+    **{ticker: f"{ticker.upper()}USDT" for ticker in TICKER_MAP},
+    **{cg_id: f"{ticker.upper()}USDT" for cg_id, ticker in ID_TO_TICKER.items()},
+}
+
+
+def send_message(chat_id, text, parse_mode='HTML', wait=False):
+    """發送 Telegram 訊息
+    
+    預設加入發送佇列，由背景執行緒送出，不解析 Telegram 回應；
+    需要回應內容（如 message_id）時傳入 wait=True，同步發送並回傳 JSON。
+    """
     if not TELEGRAM_BOT_TOKEN:
         logger.error("TELEGRAM_BOT_TOKEN 未設置")
         return None
-        
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    
+    if wait:
+        return _post_message(chat_id, text, parse_mode, parse_response=True)
+    
+    _ensure_outbox_worker()
+    _OUT_Q.put((chat_id, text, parse_mode))
+    return None
+
+
+def _acquire_send_slot():
+    """從令牌桶取得一個發送名額，名額用完時等待至下一個令牌產生"""
+    global _send_tokens, _send_tokens_ts
+    with _send_rate_lock:
+        now = time.monotonic()
+        _send_tokens = min(
+            TELEGRAM_RATE_LIMIT,
+            _send_tokens + (now - _send_tokens_ts) * TELEGRAM_RATE_LIMIT
+        )
+        _send_tokens_ts = now
+        # 先預約名額再於鎖外等待，其他執行緒可同時排隊
+        _send_tokens -= 1
+        wait = -_send_tokens / TELEGRAM_RATE_LIMIT
+    if wait > 0:
+        time.sleep(wait)
+
+
+def _post_message(chat_id, text, parse_mode='HTML', parse_response=False):
+    """實際呼叫 Telegram sendMessage API
+    
+    parse_response=True 時回傳解析後的 JSON，否則回傳 HTTP 狀態碼（連線失敗為 None）
+    """
+    _acquire_send_slot()
     data = {
         'chat_id': chat_id,
         'text': text,
         'parse_mode': parse_mode
     }
     try:
-        response = requests.post(url, json=data, timeout=10)
-        return response.json()
+        response = SESSION.post(
+            SEND_MESSAGE_URL,
+            data=orjson.dumps(data),
+            headers={'Content-Type': 'application/json'},
+            timeout=TELEGRAM_TIMEOUT
+        )
+        if parse_response:
+            return orjson.loads(response.content)
+        if not response.ok:
+            logger.error(f"發送訊息失敗: HTTP {response.status_code}")
+        return response.status_code
     except Exception as e:
         logger.error(f"發送訊息失敗: {e}")
-        return None
+    return None
+
+
+def _ensure_outbox_worker():
+    """啟動發送佇列背景執行緒（僅啟動一次）"""
+    global _outbox_thread
+    if _outbox_thread is not None and _outbox_thread.is_alive():
+        return
+    with _outbox_lock:
+        if _outbox_thread is None or not _outbox_thread.is_alive():
+            _outbox_thread = threading.Thread(target=_outbox_loop, name='telegram-outbox', daemon=True)
+            _outbox_thread.start()
+
+
+def _outbox_loop():
+    """發送佇列主循環
+    
+    佇列中只有一則訊息時立即發送以維持延遲；
+    尖峰時段則在合併視窗內收集訊息，將同一聊天的連續訊息合併後發送。
+    """
+    while True:
+        batch = [_OUT_Q.get()]
+        if not _OUT_Q.empty():
+            deadline = time.monotonic() + OUTBOX_DEBOUNCE_SECONDS
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(_OUT_Q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        
+        for chat_id, chunks in _merge_outgoing(batch).items():
+            _schedule_chat_send(chat_id, chunks)
+
+
+def _merge_outgoing(batch):
+    """將同一聊天中連續、同一格式的訊息分組，合併後單則不超過 Telegram 長度上限
+    
+    Returns:
+        chat_id -> [(parse_mode, [訊息...]), ...]，保持原本的先後順序
+    """
+    merged = {}
+    for chat_id, text, parse_mode in batch:
+        chunks = merged.setdefault(chat_id, [])
+        if chunks and chunks[-1][0] == parse_mode:
+            texts = chunks[-1][1]
+            merged_length = sum(map(len, texts)) + len(MESSAGE_SEPARATOR) * len(texts) + len(text)
+            if merged_length <= TELEGRAM_MAX_MESSAGE_LENGTH:
+                texts.append(text)
+                continue
+        chunks.append((parse_mode, [text]))
+    return merged
+
+
+def _schedule_chat_send(chat_id, chunks):
+    """將訊息排入該聊天的佇列；該聊天沒有進行中的發送任務時才提交新任務"""
+    with _chat_outbox_lock:
+        pending = _chat_outbox.get(chat_id)
+        if pending is not None:
+            pending.extend(chunks)
+            return
+        _chat_outbox[chat_id] = deque(chunks)
+    SEND_POOL.submit(_drain_chat, chat_id)
+
+
+def _drain_chat(chat_id):
+    """依序送出同一聊天的所有待發送訊息，佇列清空後結束"""
+    while True:
+        with _chat_outbox_lock:
+            pending = _chat_outbox[chat_id]
+            if not pending:
+                del _chat_outbox[chat_id]
+                return
+            parse_mode, texts = pending.popleft()
+        try:
+            _send_merged(chat_id, texts, parse_mode)
+        except Exception as e:
+            logger.error(f"發送訊息失敗: {e}")
+
+
+def _send_merged(chat_id, texts, parse_mode):
+    """合併發送一組訊息；Telegram 拒絕合併後的內容時改為逐則發送，避免整組遺失"""
+    status = _post_message(chat_id, MESSAGE_SEPARATOR.join(texts), parse_mode)
+    if status == TELEGRAM_BAD_REQUEST and len(texts) > 1:
+        for text in texts:
+            _post_message(chat_id, text, parse_mode)
+
+
+def get_user_cached(user_id):
+    """獲取用戶資料（帶 TTL 快取）"""
+    now = time.monotonic()
+    with _user_cache_lock:
+        cached = _user_cache.get(user_id)
+    if cached and now - cached[0] < USER_CACHE_TTL:
+        return cached[1]
+    
+    user = db.get_user(user_id)
+    if user:
+        with _user_cache_lock:
+            # 重新寫入時移到最後，超過上限時移除最早寫入的項目
+            _user_cache.pop(user_id, None)
+            if len(_user_cache) >= USER_CACHE_MAXSIZE:
+                _user_cache.pop(next(iter(_user_cache)))
+            _user_cache[user_id] = (now, user)
+    return user
+
+
+def ensure_user(user_id):
+    """確保用戶存在（已快取的用戶不再查詢資料庫，新用戶於背景寫入）"""
+    if get_user_cached(user_id):
+        return
+    db.init_user_async(user_id)
 
 
 def get_user_timezone(user_id):
     """獲取用戶時區"""
-    user = db.get_user(user_id)
+    user = get_user_cached(user_id)
     if user:
         return user['timezone']
     return 'Asia/Taipei'
@@ -91,40 +412,178 @@ def fetch_crypto_price_multi_source(query):
     """多重來源獲取價格 (支援 CoinGecko 與 Binance)"""
     query = query.lower().strip()
     
-    # 常見幣種映射表 (Ticker -> CoinGecko ID)
-    # 用戶輸入可能是 ticker (btc) 也可能是 id (bitcoin)
-    TICKER_MAP = {
-        'btc': 'bitcoin',
-        'eth': 'ethereum',
-        'sol': 'solana',
-        'bnb': 'binancecoin',
-        'xrp': 'ripple',
-        'ada': 'cardano',
-        'doge': 'dogecoin',
-        'avax': 'avalanche-2',
-        'dot': 'polkadot',
-        'matic': 'matic-network',
-        'link': 'chainlink',
-        'ltc': 'litecoin',
-        'uni': 'uniswap',
-        'atom': 'cosmos',
-        'etc': 'ethereum-classic',
-        'xlm': 'stellar',
-        'trx': 'tron',
-        'busd': 'binance-usd',
-        'shib': 'shiba-inu'
-    }
+    cg_id = resolve_cg_id(query)
+    
+    cached = _lookup_price(cg_id)
+    if cached:
+        return cached
+    
+    # 網路請求不持有鎖，避免慢速查詢阻塞其他幣種
+    result = _fetch_price_uncached(query, cg_id)
+    if result:
+        _store_price(result, query, cg_id)
+    return result
+
+
+def resolve_cg_id(query):
+    """
+    決定 CoinGecko 使用的 ID
+    
+    ticker (如 btc) 依序查 TICKER_MAP 與預載索引轉為 bitcoin；
+    已是全名 (如 bitcoin) 或查無對應時保持不變
+    """
+    return TICKER_MAP.get(query) or SYMBOL_INDEX.get(query, query)
+
+
+def preload_symbol_index():
+    """以單次 /coins/markets 請求預載市值前幾名的 ticker -> ID 索引"""
+    try:
+        response = SESSION.get(
+            "https://api.coingecko.com/api/v3/coins/markets",
+            params={
+                'vs_currency': 'usd',
+                'order': 'market_cap_desc',
+                'per_page': SYMBOL_INDEX_SIZE,
+                'page': 1
+            },
+            headers=COINGECKO_HEADERS,
+            timeout=10
+        )
+        if response.status_code != 200:
+            logger.warning(f"預載幣種索引失敗: {response.status_code}")
+            return
+        
+        index = {}
+        for coin in orjson.loads(response.content):
+            index.setdefault(coin['symbol'].lower(), coin['id'])
+        SYMBOL_INDEX.update(index)
+        logger.info(f"✅ 已預載 {len(index)} 個幣種索引")
+    except Exception as e:
+        logger.warning(f"預載幣種索引失敗: {e}")
+
+
+def _lookup_price(cg_id):
+    """依序查詢背景價格表與 TTL 快取"""
+    with _price_map_lock:
+        snapshot = PRICE_MAP.get(cg_id)
+    if snapshot and time.monotonic() - snapshot[0] < PRICE_MAP_MAX_AGE:
+        return snapshot[1]
+    return _get_cached_price(cg_id)
+
+
+def start_price_refresher():
+    """啟動背景價格刷新執行緒（僅啟動一次）"""
+    global _price_refresher_thread
+    with _price_map_lock:
+        if _price_refresher_thread is not None and _price_refresher_thread.is_alive():
+            return
+        _price_refresher_thread = threading.Thread(
+            target=_price_refresher, name='price-refresher', daemon=True
+        )
+        _price_refresher_thread.start()
+
+
+def _price_refresher():
+    """每 PRICE_REFRESH_INTERVAL 秒以單次 CoinGecko 請求刷新常用、監控中與訂閱中幣種的價格"""
+    while True:
+        if not SYMBOL_INDEX:
+            preload_symbol_index()
+        
+        try:
+            # 常用幣種、監控中與訂閱中的幣種合併為單次 /simple/price 請求
+            cg_ids = set(TICKER_MAP.values())
+            for symbol in (*db.get_watched_symbols(), *db.get_subscribed_symbols()):
+                cg_ids.add(resolve_cg_id(symbol.lower().strip()))
+            
+            prices = _fetch_coingecko_batch(cg_ids)
+            now = time.monotonic()
+            with _price_map_lock:
+                for cg_id, price_data in prices.items():
+                    PRICE_MAP[cg_id] = (now, price_data)
+        except Exception as e:
+            logger.error(f"背景價格刷新失敗: {e}")
+        
+        time.sleep(PRICE_REFRESH_INTERVAL)
+
+
+def _fetch_coingecko_batch(cg_ids):
+    """以單次 CoinGecko /simple/price 請求取得多個幣種價格，回傳 cg_id -> 價格資料"""
+    results = {}
+    if not cg_ids:
+        return results
     
-    # 決定 CoinGecko 使用的 ID
-    # 如果輸入是 ticker (如 btc)，轉為 bitcoin
-    # 如果輸入已是全名 (如 bitcoin)，保持不變 (TICKER_MAP.get('bitcoin', 'bitcoin') -> 'bitcoin')
-    cg_id = TICKER_MAP.get(query, query)
+    try:
+        url = "https://api.coingecko.com/api/v3/simple/price"
+        params = {
+            'ids': ','.join(sorted(set(cg_ids))),
+            'vs_currencies': 'usd',
+            'include_24hr_change': 'true'
+        }
+        
+        response = SESSION.get(url, params=params, headers=COINGECKO_HEADERS, timeout=5)
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            for cg_id in cg_ids:
+                if cg_id in data:
+                    results[cg_id] = _parse_coingecko_price(data[cg_id])
+        else:
+            logger.warning(f"CoinGecko batch fetch failed: {response.status_code}")
+    except Exception as e:
+        logger.warning(f"CoinGecko batch fetch failed: {e}")
     
-    # 1. CoinGecko API
+    return results
+
+
+def _get_cached_price(key):
+    """讀取未過期的價格快取，沒有則回傳 None"""
+    with _price_cache_lock:
+        cached = _price_cache.get(key)
+    if cached and time.monotonic() - cached[0] < PRICE_TTL:
+        return cached[1]
+    return None
+
+
+def _store_price(result, *keys):
+    """寫入價格快取，並定期清除過期項目"""
+    global _price_cache_pruned
+    now = time.monotonic()
+    with _price_cache_lock:
+        if now - _price_cache_pruned > PRICE_TTL:
+            for key in [k for k, (ts, _) in _price_cache.items() if now - ts >= PRICE_TTL]:
+                del _price_cache[key]
+            _price_cache_pruned = now
+        for key in keys:
+            if len(_price_cache) >= PRICE_CACHE_MAXSIZE and key not in _price_cache:
+                # 移除最早寫入的項目
+                _price_cache.pop(next(iter(_price_cache)))
+            _price_cache[key] = (now, result)
+
+
+def _fetch_price_uncached(query, cg_id):
+    """實際向 CoinGecko / Binance 查詢價格
+    
+    先送出 CoinGecko 請求；若 PRICE_HEDGE_DELAY 內未回應則同時送出 Binance 請求，
+    取先成功者，避免 CoinGecko 緩慢時要等到逾時才改用 Binance。
+    """
+    cg_future = PRICE_POOL.submit(_fetch_coingecko_price, cg_id)
+    try:
+        result = cg_future.result(timeout=PRICE_HEDGE_DELAY)
+        # CoinGecko 很快就失敗時直接改用 Binance
+        return result or _fetch_binance_price(query)
+    except FutureTimeoutError:
+        pass
+    
+    bn_future = PRICE_POOL.submit(_fetch_binance_price, query)
+    for future in as_completed((cg_future, bn_future)):
+        result = future.result()
+        if result:
+            return result
+    return None
+
+
+def _fetch_coingecko_price(cg_id):
+    """從 CoinGecko 獲取單一幣種價格"""
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        if COINGECKO_API_KEY:
-            headers['x-cg-demo-api-key'] = COINGECKO_API_KEY
             
         url = "https://api.coingecko.com/api/v3/simple/price"
         params = {
@@ -133,58 +592,180 @@ def fetch_crypto_price_multi_source(query):
             'include_24hr_change': 'true'
         }
         
-        response = requests.get(url, params=params, headers=headers, timeout=5)
+        response = SESSION.get(url, params=params, headers=COINGECKO_HEADERS, timeout=5)
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             if cg_id in data:
-                return {
-                    'source': 'CoinGecko',
-                    'price': float(data[cg_id]['usd']),
-                    'change_24h': float(data[cg_id].get('usd_24h_change', 0))
-                }
+                return _parse_coingecko_price(data[cg_id])
     except Exception as e:
-        logger.warning(f"CoinGecko fetch failed for {query}: {e}")
+        logger.warning(f"CoinGecko fetch failed for {cg_id}: {e}")
+    
+    return None
+
+
+def fetch_crypto_prices_batch(queries):
+    """批量獲取多個幣種價格 (單次 CoinGecko 請求)
+    
+    CoinGecko /simple/price 支援以逗號分隔的多個 ids，一次請求即可取得所有價格；
+    回應中缺少的幣種才改用 Binance 並行查詢。
+    
+    Args:
+        queries: ticker 或 CoinGecko ID 列表 (如 ['btc', 'ethereum'])
+    
+    Returns:
+        以小寫輸入為 key 的價格字典，無法獲取價格的幣種不會出現在結果中
+    """
+    cg_ids = {}
+    results = {}
+    for query in queries:
+        query = query.lower().strip()
+        cg_id = resolve_cg_id(query)
+        cached = _lookup_price(cg_id)
+        if cached:
+            results[query] = cached
+        else:
+            cg_ids[query] = cg_id
+    
+    if not cg_ids:
+        return results
+    
+    # 1. CoinGecko API (單次批量請求)
+    prices = _fetch_coingecko_batch(set(cg_ids.values()))
+    for query, cg_id in cg_ids.items():
+        if cg_id in prices:
+            results[query] = prices[cg_id]
+            _store_price(results[query], query, cg_id)
+    
+    # 2. Binance API Fallback (僅針對缺漏的幣種，單次批量請求)
+    missing = [query for query in cg_ids if query not in results]
+    if missing:
+        for query, price_data in _fetch_binance_batch(missing).items():
+            results[query] = price_data
+            _store_price(price_data, query, cg_ids[query])
+    
+    return results
+
 
-    # 2. Binance API Fallback
+def _fetch_binance_batch(queries):
+    """以單次 Binance /ticker/24hr 請求取得多個幣種價格，回傳 query -> 價格資料
+    
+    Binance 只要 symbols 中有一個無效交易對就會整批回 400，
+    此時改回逐一並行查詢。
+    """
+    symbols = {}
+    for query in queries:
+        symbol = _binance_symbol(query)
+        if symbol is not None:
+            symbols.setdefault(symbol, []).append(query)
+    
+    results = {}
+    if not symbols:
+        return results
+    
     try:
-        # 嘗試構建 Binance Symbol
-        # 主要邏輯：轉成大寫 + USDT
-        # 如果輸入是 'bitcoin'，我們要先試著轉回 ticker 'BTC'
-        
-        # 反向映射: valid IDs to Tickers
-        ID_TO_TICKER = {v: k for k, v in TICKER_MAP.items()}
+        url = "https://api.binance.com/api/v3/ticker/24hr"
+        params = {'symbols': orjson.dumps(sorted(symbols)).decode()}
         
-        ticker = query
-        if query in ID_TO_TICKER: 
-            ticker = ID_TO_TICKER[query]
-            
-        # 防止過長的字串直接當 ticker (Binance 通常是 3-5 碼)
-        if len(ticker) <= 5:    
-            symbol = f"{ticker.upper()}USDT"
-            
-            url = f"https://api.binance.com/api/v3/ticker/24hr"
-            params = {'symbol': symbol}
-            
-            response = requests.get(url, params=params, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    'source': 'Binance',
-                    'price': float(data['lastPrice']),
-                    'change_24h': float(data['priceChangePercent'])
-                }
+        response = SESSION.get(url, params=params, timeout=5)
+        if response.status_code == 200:
+            for ticker in orjson.loads(response.content):
+                price_data = _parse_binance_ticker(ticker)
+                for query in symbols.get(ticker['symbol'], ()):
+                    results[query] = price_data
+            return results
+        logger.warning(f"Binance batch fetch failed: {response.status_code}")
+    except Exception as e:
+        logger.warning(f"Binance batch fetch failed: {e}")
+    
+    queries = [query for group in symbols.values() for query in group]
+    for query, price_data in zip(queries, PRICE_POOL.map(_fetch_binance_price, queries)):
+        if price_data:
+            results[query] = price_data
+    return results
+
+
+def _parse_binance_ticker(ticker):
+    """將 Binance /ticker/24hr 的單一交易對資料轉為統一格式"""
+    return {
+        'source': 'Binance',
+        'price': float(ticker['lastPrice']),
+        'change_24h': float(ticker['priceChangePercent'])
+    }
+
+
+def _parse_coingecko_price(coin_data):
+    """將 CoinGecko /simple/price 的單一幣種資料轉為統一格式"""
+    return {
+        'source': 'CoinGecko',
+        'price': float(coin_data['usd']),
+        'change_24h': float(coin_data.get('usd_24h_change', 0))
+    }
+
+
+def _binance_symbol(query):
+    """將 ticker 或 CoinGecko ID 轉成 Binance 交易對，無法對應時回傳 None"""
+    symbol = BINANCE_PAIR_MAP.get(query)
+    if symbol is not None:
+        return symbol
+    # 防止過長的字串直接當 ticker (Binance 通常是 3-5 碼)
+    if len(query) <= 5:
+        return f"{query.upper()}USDT"
+    return None
+
+
+def _fetch_binance_price(query):
+    """從 Binance 獲取價格 (CoinGecko 失敗時的備用來源)"""
+    try:
+        symbol = _binance_symbol(query)
+        if symbol is None:
+            return None
+
+        url = "https://api.binance.com/api/v3/ticker/24hr"
+        params = {'symbol': symbol}
+
+        response = SESSION.get(url, params=params, timeout=5)
+        if response.status_code == 200:
+            return _parse_binance_ticker(orjson.loads(response.content))
     except Exception as e:
         logger.warning(f"Binance fetch failed for {query}: {e}")
         
     return None
 
 
-def handle_start(chat_id, user_id):
-    """處理 /start 指令"""
-    # 初始化用戶資料
-    db.init_user(user_id)
-    
-    welcome = f"""
+# HTML parse_mode 的跳脫表：外部來源的標題、名稱與連結需先跳脫，否則 Telegram 會拒收整則訊息
+_HTML_ESCAPE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#39;',
+})
+
+
+def escape_html(text):
+    """以單次 str.translate 跳脫 HTML 特殊字元"""
+    return text.translate(_HTML_ESCAPE)
+
+
+def safe_reply(log_message, reply):
+    """指令處理的共用錯誤處理：記錄例外並回覆用戶固定的錯誤訊息
+
+    被裝飾的 handler 第一個參數必須是 chat_id
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(chat_id, *args, **kwargs):
+            try:
+                return func(chat_id, *args, **kwargs)
+            except Exception as e:
+                logger.error(f"{log_message}: {e}")
+                send_message(chat_id, reply)
+        return wrapper
+    return decorator
+
+
+# 靜態回覆內容：匯入時建立一次，處理指令時直接送出
+WELCOME_MESSAGE = """
 🤖 <b>歡迎使用智能加密貨幣投資顧問</b>
 
 我可以幫您：
@@ -202,12 +783,8 @@ def handle_start(chat_id, user_id):
 
 輸入 /help 查看完整功能列表
 """
-    send_message(chat_id, welcome)
-
 
-def handle_help(chat_id):
-    """處理 /help 指令"""
-    help_text = """
+HELP_MESSAGE = """
 📖 <b>智能加密貨幣投資顧問 - 指令列表</b>
 
 <b>🚀 基礎指令</b>
@@ -238,57 +815,184 @@ def handle_help(chat_id):
 • /analyze BTC
 • /alert BTC 50000 high
 """
-    send_message(chat_id, help_text)
+
+# /price、/analyze 回覆模板：固定文字只建立一次，查詢時以 format 填入數值
+PRICE_TEMPLATE = """
+💰 <b>{symbol} 價格</b>
+
+當前價格: ${price:,.2f}
+24小時變化: {emoji} {change:+.2f}%
+
+數據來源: {source}
+"""
+
+ANALYZE_TEMPLATE = """
+📊 <b>{symbol} 技術分析</b>
+
+💰 當前價格: ${price:,.2f}
+📈 24小時漲跌: {change:.2f}%
+
+<b>技術指標分析：</b>
+基於當前價格走勢和市場數據的綜合評估
+
+<b>💡 交易建議：</b>
+• 關注市場趨勢變化
+• 設定止損止盈點位
+• 分批進場降低風險
+• 密切注意交易量變化
+
+⚠️ 投資有風險，請謹慎決策
+"""
+
+
+def handle_start(chat_id, user_id):
+    """處理 /start 指令"""
+    # 初始化用戶資料
+    ensure_user(user_id)
+    send_message(chat_id, WELCOME_MESSAGE)
+
+
+def handle_help(chat_id):
+    """處理 /help 指令"""
+    send_message(chat_id, HELP_MESSAGE)
+
+
+def parse_rss_light(content, limit=FEED_ENTRY_LIMIT):
+    """以 iterparse 串流解析 RSS / Atom，只取前 limit 條的標題與連結"""
+    entries = []
+    for _, elem in ElementTree.iterparse(BytesIO(content), events=('end',)):
+        if elem.tag == 'item':
+            title = elem.findtext('title')
+            link = elem.findtext('link')
+        elif elem.tag == f'{ATOM_NS}entry':
+            title = elem.findtext(f'{ATOM_NS}title')
+            link_elem = elem.find(f'{ATOM_NS}link')
+            link = link_elem.get('href') if link_elem is not None else None
+        else:
+            continue
+        
+        if title and link:
+            entries.append({'title': title.strip(), 'link': link.strip()})
+        # 釋放已處理項目的子節點
+        elem.clear()
+        if len(entries) >= limit:
+            break
+    return entries
+
+
+def _parse_feed(content):
+    """解析新聞源內容；XML 格式不正確時改用 feedparser 容錯解析"""
+    try:
+        return parse_rss_light(content)
+    except ElementTree.ParseError:
+        feed = feedparser.parse(content)
+        return [
+            {'title': entry.title, 'link': entry.link}
+            for entry in feed.entries[:FEED_ENTRY_LIMIT]
+            if entry.get('title') and entry.get('link')
+        ]
+
+
+def cached_parse(url):
+    """抓取並解析新聞源（帶 TTL 快取；過期後以 ETag / Last-Modified 條件請求重新驗證）
+    
+    透過 SESSION 下載並設定逾時；回傳 [{'title', 'link'}, ...]，
+    抓取失敗時回傳上次的解析結果，沒有則回傳 None。
+    """
+    now = time.monotonic()
+    with _feed_cache_lock:
+        cached = _feed_cache.get(url)
+    if cached and now - cached['ts'] < FEED_CACHE_TTL:
+        return cached['entries']
+    
+    headers = {}
+    if cached:
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['modified']:
+            headers['If-Modified-Since'] = cached['modified']
+    
+    try:
+        response = SESSION.get(url, headers=headers, timeout=FEED_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"RSS 抓取失敗 {url}: {e}")
+        return cached['entries'] if cached else None
+    
+    if response.status_code == 304 and cached:
+        # 內容未變更，沿用上次解析結果
+        with _feed_cache_lock:
+            cached['ts'] = now
+        return cached['entries']
+    
+    if response.status_code != 200:
+        logger.warning(f"RSS 抓取失敗 {url}: HTTP {response.status_code}")
+        return cached['entries'] if cached else None
+    
+    entries = _parse_feed(response.content)
+    if entries:
+        with _feed_cache_lock:
+            _feed_cache[url] = {
+                'ts': now,
+                'entries': entries,
+                'etag': response.headers.get('ETag'),
+                'modified': response.headers.get('Last-Modified'),
+            }
+    return entries
 
 
+@safe_reply("獲取新聞失敗", "❌ 獲取新聞失敗，請稍後再試")
 def handle_news(chat_id, lang='zh'):
     """處理新聞查詢"""
     feeds = NEWS_FEEDS.get(lang, NEWS_FEEDS['zh'])
     news_items = []
     
+    futures = [FEED_POOL.submit(cached_parse, url) for url in feeds]
     try:
-        def fetch_feed(url):
-            return feedparser.parse(url)
-
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            results = executor.map(fetch_feed, feeds)
-            
-            for feed in results:
-                if feed.entries:
-                    for entry in feed.entries[:3]:  # 每個源取前3條
-                        news_items.append({
-                            'title': entry.title,
-                            'link': entry.link,
-                            'published': entry.get('published', 'N/A')
-                        })
-        
-        # 按發布時間排序（如果有的話）
-        # 簡單起見，直接取前 5 條
-        news_items = news_items[:5]
+        # 先回來的源先用，湊滿 NEWS_LIMIT 條就不再等其他源
+        for future in as_completed(futures, timeout=FEED_DEADLINE):
+            entries = future.result()
+            if not entries:
+                continue
+            for entry in entries[:NEWS_PER_FEED]:
+                news_items.append((entry['title'], entry['link']))
+                if len(news_items) >= NEWS_LIMIT:
+                    break
+            if len(news_items) >= NEWS_LIMIT:
+                break
+    except FutureTimeoutError:
+        # 超過總時限的新聞源直接略過
+        logger.warning("部分新聞源逾時，略過")
+    finally:
+        # 取消尚未開始的抓取，不等待進行中的請求
+        for future in futures:
+            future.cancel()
+    
+    if not news_items:
+        send_message(chat_id, "⚠️ 暫時沒有最新新聞")
+        return
         
-        if not news_items:
-            send_message(chat_id, "⚠️ 暫時沒有最新新聞")
-            return
-            
-        message = "📰 <b>最新加密貨幣新聞</b>\n\n"
-        for item in news_items:
-            message += f"🔹 <a href='{item['link']}'>{item['title']}</a>\n\n"
-            
-        send_message(chat_id, message)
+    parts = ["📰 <b>最新加密貨幣新聞</b>\n\n"]
+    parts.extend(
+        f"🔹 <a href='{escape_html(link)}'>{escape_html(title)}</a>\n\n" for title, link in news_items
+    )
         
-    except Exception as e:
-        logger.error(f"獲取新聞失敗: {e}")
-        send_message(chat_id, "❌ 獲取新聞失敗，請稍後再試")
+    send_message(chat_id, "".join(parts))
+
+
+def dedupe_news(news_items):
+    """依正規化後標題的雜湊去除重複新聞，保留首次出現的順序"""
+    seen = set()
+    deduped = []
+    for item in news_items:
+        digest = hashlib.blake2b(item['title'].strip().lower().encode(), digest_size=8).digest()
+        if digest not in seen:
+            seen.add(digest)
+            deduped.append(item)
+    return deduped
 
 
 def analyze_news_sentiment(news_items):
     """分析新聞情緒並預測走勢"""
-    # 關鍵字情緒分析
-    positive_keywords = ['surge', 'rally', 'bullish', 'growth', 'adoption', 'breakthrough', 
-                        '上漲', '看漲', '突破', '增長', '採用', '利好', '暴漲', '飆升']
-    negative_keywords = ['crash', 'drop', 'bearish', 'decline', 'ban', 'hack', 'scam',
-                        '下跌', '看跌', '暴跌', '禁令', '駭客', '騙局', '崩盤']
-    
     sentiment_score = 0
     analyzed_news = []
     
@@ -297,12 +1001,9 @@ def analyze_news_sentiment(news_items):
         item_sentiment = 0
         
         # 計算單條新聞情緒
-        for keyword in positive_keywords:
-            if keyword.lower() in title_lower:
-                item_sentiment += 1
-        for keyword in negative_keywords:
-            if keyword.lower() in title_lower:
-                item_sentiment -= 1
+        # 每個關鍵字只計一次，與逐一比對的結果相同
+        item_sentiment += len(set(_POSITIVE_RE.findall(title_lower)))
+        item_sentiment -= len(set(_NEGATIVE_RE.findall(title_lower)))
         
         sentiment_score += item_sentiment
         
@@ -346,76 +1047,67 @@ def analyze_news_sentiment(news_items):
     }
 
 
+@safe_reply("趨勢分析失敗", "❌ 趨勢分析失敗，請稍後再試")
 def handle_trend(chat_id, crypto=None):
     """處理趨勢預測指令 - 基於新聞分析"""
-    try:
-        # 獲取新聞
-        feeds = NEWS_FEEDS.get('zh', NEWS_FEEDS['zh'])
-        news_items = []
-        
-        def fetch_feed(url):
-            return feedparser.parse(url)
-
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            results = executor.map(fetch_feed, feeds)
-            
-            for feed in results:
-                if feed.entries:
-                    for entry in feed.entries[:5]:  # 每個源取前5條
-                        # 如果指定幣種，過濾相關新聞
-                        if crypto:
-                            if crypto.upper() in entry.title.upper():
-                                news_items.append({
-                                    'title': entry.title,
-                                    'link': entry.link,
-                                    'published': entry.get('published', 'N/A')
-                                })
-                        else:
-                            news_items.append({
-                                'title': entry.title,
-                                'link': entry.link,
-                                'published': entry.get('published', 'N/A')
-                            })
-        
-        if not news_items:
-            if crypto:
-                send_message(chat_id, f"⚠️ 未找到關於 {crypto.upper()} 的相關新聞")
-            else:
-                send_message(chat_id, "⚠️ 暫時沒有最新新聞")
-            return
-        
-        # 分析新聞情緒
-        analysis = analyze_news_sentiment(news_items[:10])
-        
-        # 構建回覆訊息
+    # 獲取新聞
+    feeds = NEWS_FEEDS.get('zh', NEWS_FEEDS['zh'])
+    news_items = []
+    
+    futures = [FEED_POOL.submit(cached_parse, url) for url in feeds]
+    done, _ = wait_futures(futures, timeout=FEED_DEADLINE)
+    
+    for future in futures:
+        # 超過總時限的新聞源直接略過
+        entries = future.result() if future in done else None
+        if entries:
+            for entry in entries[:5]:  # 每個源取前5條
+                # 如果指定幣種，過濾相關新聞
+                if crypto:
+                    if crypto.upper() in entry['title'].upper():
+                        news_items.append(entry)
+                else:
+                    news_items.append(entry)
+    
+    if not news_items:
         if crypto:
-            message = f"📊 <b>{crypto.upper()} 市場趨勢分析</b>\n\n"
+            send_message(chat_id, f"⚠️ 未找到關於 {crypto.upper()} 的相關新聞")
         else:
-            message = "📊 <b>加密貨幣市場趨勢分析</b>\n\n"
-        
-        message += f"<b>整體趨勢：</b>{analysis['overall_trend']}\n"
-        message += f"<b>情緒指數：</b>{analysis['sentiment_score']}\n"
-        message += f"<b>操作建議：</b>{analysis['recommendation']}\n\n"
-        message += "━━━━━━━━━━━━━━━━━━\n\n"
-        message += "📰 <b>相關新聞分析：</b>\n\n"
-        
-        for idx, item in enumerate(analysis['analyzed_news'][:5], 1):
-            message += f"{idx}. {item['sentiment']}\n"
-            message += f"<a href='{item['link']}'>{item['title'][:80]}</a>\n\n"
-        
-        message += "\n💡 <i>* 本分析基於新聞標題關鍵字，僅供參考</i>"
-        
-        send_message(chat_id, message)
-        
-    except Exception as e:
-        logger.error(f"趨勢分析失敗: {e}")
-        send_message(chat_id, "❌ 趨勢分析失敗，請稍後再試")
+            send_message(chat_id, "⚠️ 暫時沒有最新新聞")
+        return
+    
+    # 分析新聞情緒（先去除不同來源轉載的重複標題，避免情緒被重複計分）
+    analysis = analyze_news_sentiment(dedupe_news(news_items)[:10])
+    
+    # 構建回覆訊息
+    if crypto:
+        header = f"📊 <b>{crypto.upper()} 市場趨勢分析</b>\n\n"
+    else:
+        header = "📊 <b>加密貨幣市場趨勢分析</b>\n\n"
+    
+    parts = [
+        header,
+        f"<b>整體趨勢：</b>{analysis['overall_trend']}\n",
+        f"<b>情緒指數：</b>{analysis['sentiment_score']}\n",
+        f"<b>操作建議：</b>{analysis['recommendation']}\n\n",
+        "━━━━━━━━━━━━━━━━━━\n\n",
+        "📰 <b>相關新聞分析：</b>\n\n",
+    ]
+    
+    for idx, item in enumerate(analysis['analyzed_news'][:5], 1):
+        parts.append(f"{idx}. {item['sentiment']}\n")
+        parts.append(f"<a href='{escape_html(item['link'])}'>{escape_html(item['title'][:80])}</a>\n\n")
+    
+    parts.append("\n💡 <i>* 本分析基於新聞標題關鍵字，僅供參考</i>")
+    
+    send_message(chat_id, "".join(parts))
 
 
+@safe_reply("分析失敗", "❌ 分析失敗，請稍後再試")
 def handle_analyze(chat_id, user_id, crypto):
     """處理技術分析"""
     # 初始化用戶
-    db.init_user(user_id)
+    ensure_user(user_id)
     
     # 獲取價格數據
     price_data = fetch_crypto_price_multi_source(crypto.lower())
@@ -424,28 +1116,12 @@ def handle_analyze(chat_id, user_id, crypto):
         return
     
     # 生成技術分析報告
-    try:
-        analysis = f"""
-📊 <b>{crypto.upper()} 技術分析</b>
-
-💰 當前價格: ${price_data['price']:,.2f}
-📈 24小時漲跌: {price_data['change_24h']:.2f}%
-
-<b>技術指標分析：</b>
-基於當前價格走勢和市場數據的綜合評估
-
-<b>💡 交易建議：</b>
-• 關注市場趨勢變化
-• 設定止損止盈點位
-• 分批進場降低風險
-• 密切注意交易量變化
-
-⚠️ 投資有風險，請謹慎決策
-"""
-        send_message(chat_id, analysis)
-    except Exception as e:
-        logger.error(f"分析失敗: {e}")
-        send_message(chat_id, "❌ 分析失敗，請稍後再試")
+    analysis = ANALYZE_TEMPLATE.format(
+        symbol=escape_html(crypto.upper()),
+        price=price_data['price'],
+        change=price_data['change_24h']
+    )
+    send_message(chat_id, analysis)
 
 
 def handle_price(chat_id, crypto):
@@ -456,91 +1132,103 @@ def handle_price(chat_id, crypto):
         send_message(chat_id, f"❌ 無法獲取 {crypto} 的價格")
         return
     
-    change_emoji = "🟢" if price_data['change_24h'] >= 0 else "🔴"
-    
-    message = f"""
-💰 <b>{crypto.upper()} 價格</b>
-
-當前價格: ${price_data['price']:,.2f}
-24小時變化: {change_emoji} {price_data['change_24h']:+.2f}%
-
-數據來源: {price_data['source']}
-"""
+    change = price_data['change_24h']
+    message = PRICE_TEMPLATE.format(
+        symbol=escape_html(crypto.upper()),
+        price=price_data['price'],
+        emoji="🟢" if change >= 0 else "🔴",
+        change=change,
+        source=price_data['source']
+    )
     send_message(chat_id, message)
 
 
-def handle_top(chat_id):
-    """顯示市值前10名"""
+def _fetch_top_message():
+    """向 CoinGecko 取得市值前10名並組成訊息，失敗回傳 None"""
+    url = "https://api.coingecko.com/api/v3/coins/markets"
+    params = {
+        'vs_currency': 'usd',
+        'order': 'market_cap_desc',
+        'per_page': 10,
+        'page': 1
+    }
+    
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        if COINGECKO_API_KEY:
-            headers['x-cg-demo-api-key'] = COINGECKO_API_KEY
-        
-        url = "https://api.coingecko.com/api/v3/coins/markets"
-        params = {
-            'vs_currency': 'usd',
-            'order': 'market_cap_desc',
-            'per_page': 10,
-            'page': 1
-        }
+        response = SESSION.get(url, params=params, headers=COINGECKO_HEADERS, timeout=10)
         
-        try:
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+        if response.status_code == 200:
+            coins = orjson.loads(response.content)
             
-            if response.status_code == 200:
-                coins = response.json()
-                
-                message = "🏆 <b>市值前10名加密貨幣</b>\n\n"
-                
-                for i, coin in enumerate(coins, 1):
-                    name = coin['name']
-                    symbol = coin['symbol'].upper()
-                    price = coin['current_price']
-                    change = coin['price_change_percentage_24h']
-                    change_emoji = "🟢" if change >= 0 else "🔴"
-                    
-                    message += f"{i}. <b>{name}</b> ({symbol})\n"
-                    message += f"   ${price:,.2f} {change_emoji} {change:+.2f}%\n\n"
-                
-                send_message(chat_id, message)
-                return
-            else:
-                logger.warning(f"CoinGecko API failed: {response.status_code} - {response.text}")
-        except Exception as e:
-            logger.error(f"CoinGecko connection failed: {e}")
+            parts = ["🏆 <b>市值前10名加密貨幣</b>\n\n"]
             
-        # Fallback to Binance/Hardcoded list if CoinGecko fails
-        handle_top_fallback(chat_id)
+            for i, coin in enumerate(coins, 1):
+                change = coin['price_change_percentage_24h'] or 0
+                parts.append(TOP_COIN_TEMPLATE.format(
+                    rank=i,
+                    name=escape_html(coin['name']),
+                    symbol=escape_html(coin['symbol'].upper()),
+                    price=coin['current_price'],
+                    emoji="🟢" if change >= 0 else "🔴",
+                    change=change
+                ))
             
+            return "".join(parts)
+        else:
+            logger.warning(f"CoinGecko API failed: {response.status_code} - {response.text}")
     except Exception as e:
-        logger.error(f"獲取Top 10失敗: {e}")
-        send_message(chat_id, "❌ 查詢失敗，請稍後再試")
+        logger.error(f"CoinGecko connection failed: {e}")
+    
+    return None
+
+
+@safe_reply("獲取Top 10失敗", "❌ 查詢失敗，請稍後再試")
+def handle_top(chat_id):
+    """顯示市值前10名"""
+    cached = _TOP_CACHE['msg']
+    if cached and time.monotonic() - _TOP_CACHE['ts'] < TOP_CACHE_TTL:
+        send_message(chat_id, cached)
+        return
+    
+    # 單一請求負責刷新，其他同時進來的請求等待後直接使用結果
+    with _top_cache_lock:
+        cached = _TOP_CACHE['msg']
+        if not (cached and time.monotonic() - _TOP_CACHE['ts'] < TOP_CACHE_TTL):
+            cached = _fetch_top_message()
+            if cached:
+                _TOP_CACHE['msg'] = cached
+                _TOP_CACHE['ts'] = time.monotonic()
+    
+    if cached:
+        send_message(chat_id, cached)
+        return
+        
+    # Fallback to Binance/Hardcoded list if CoinGecko fails
+    handle_top_fallback(chat_id)
+
 
 def handle_top_fallback(chat_id):
     """CoinGecko 失敗時的備用方案 (使用 Binance 查詢主要幣種)"""
-    top_coins = [
-        ('BTC', 'Bitcoin'), ('ETH', 'Ethereum'), ('BNB', 'BNB'), 
-        ('SOL', 'Solana'), ('XRP', 'XRP'), ('DOGE', 'Dogecoin'),
-        ('ADA', 'Cardano'), ('AVAX', 'Avalanche'), ('TRX', 'TRON'), ('DOT', 'Polkadot')
-    ]
+    parts = ["🏆 <b>市場主要加密貨幣 (Fallback)</b>\n\n"]
     
-    message = "🏆 <b>市場主要加密貨幣 (Fallback)</b>\n\n"
+    # 一次批量請求取得所有幣種價格，取代逐一查詢
+    prices = fetch_crypto_prices_batch(FALLBACK_TOP_SYMBOLS)
     
     rank = 1
-    for symbol, name in top_coins:
-        price_info = fetch_crypto_price_multi_source(symbol)
+    for symbol, name in FALLBACK_TOP_COINS:
+        price_info = prices.get(symbol.lower())
         if price_info:
-            price = price_info['price']
             change = price_info['change_24h']
-            change_emoji = "🟢" if change >= 0 else "🔴"
-            
-            message += f"{rank}. <b>{name}</b> ({symbol})\n"
-            message += f"   ${price:,.2f} {change_emoji} {change:+.2f}%\n\n"
+            parts.append(TOP_COIN_TEMPLATE.format(
+                rank=rank,
+                name=name,
+                symbol=symbol,
+                price=price_info['price'],
+                emoji="🟢" if change >= 0 else "🔴",
+                change=change
+            ))
             rank += 1
             
-    send_message(chat_id, message)
+    send_message(chat_id, "".join(parts))
 
 
 def handle_alert(chat_id, user_id, parts):
@@ -589,7 +1277,7 @@ def handle_my_alerts(chat_id, user_id):
         send_message(chat_id, "🔕 您目前沒有設定任何提醒")
         return
     
-    message = "🔔 <b>您的價格提醒</b>\n\n"
+    parts = ["🔔 <b>您的價格提醒</b>\n\n"]
     
     for alert in alerts:
         symbol = alert['symbol']
@@ -599,10 +1287,10 @@ def handle_my_alerts(chat_id, user_id):
         
         condition_text = "漲破" if condition == 'above' else "跌破"
         
-        message += f"ID: {alert_id} | <b>{symbol}</b> {condition_text} ${target:,.2f}\n"
+        parts.append(f"ID: {alert_id} | <b>{symbol}</b> {condition_text} ${target:,.2f}\n")
     
-    message += "\n🗑 使用 /del_alert [ID] 刪除提醒"
-    send_message(chat_id, message)
+    parts.append("\n🗑 使用 /del_alert [ID] 刪除提醒")
+    send_message(chat_id, "".join(parts))
 
 
 def handle_del_alert(chat_id, user_id, parts):
@@ -625,66 +1313,88 @@ def handle_del_alert(chat_id, user_id, parts):
         send_message(chat_id, f"❌ 刪除失敗，找不到 ID 為 {alert_id} 的提醒或不屬於您")
 
 
+# 指令解析：一次取出 (指令, 參數)，並去除群組中的 @BotName 後綴
+_CMD_RE = re.compile(r'^(/\w+)(?:@\w+)?(?:\s+(.*))?$', re.DOTALL)
+
+UNKNOWN_COMMAND_TEXT = "❌ 未知指令\n\n輸入 /help 查看可用指令"
+
+# 指令分派表：指令 -> handler(chat_id, user_id, parts)
+COMMANDS = {
+    '/start': lambda chat_id, user_id, parts: handle_start(chat_id, user_id),
+    '/help': lambda chat_id, user_id, parts: handle_help(chat_id),
+    '/analyze': lambda chat_id, user_id, parts: (
+        handle_analyze(chat_id, user_id, parts[1]) if len(parts) > 1
+        else send_message(chat_id, "請指定幣種，例如: /analyze BTC")
+    ),
+    '/price': lambda chat_id, user_id, parts: (
+        handle_price(chat_id, parts[1]) if len(parts) > 1
+        else send_message(chat_id, "請指定幣種，例如: /price BTC")
+    ),
+    '/top': lambda chat_id, user_id, parts: handle_top(chat_id),
+    '/news': lambda chat_id, user_id, parts: handle_news(chat_id),
+    '/trend': lambda chat_id, user_id, parts: handle_trend(chat_id, parts[1] if len(parts) > 1 else None),
+    '/alert': lambda chat_id, user_id, parts: handle_alert(chat_id, user_id, parts),
+    '/myalerts': lambda chat_id, user_id, parts: handle_my_alerts(chat_id, user_id),
+    '/del_alert': lambda chat_id, user_id, parts: handle_del_alert(chat_id, user_id, parts),
+}
+
+
+def json_response(payload, status=200):
+    """以 orjson 序列化 JSON 回應"""
+    return app.response_class(orjson.dumps(payload), status=status, mimetype='application/json')
+
+
 @app.route('/webhook', methods=['POST'])
 def webhook():
-    """處理 Telegram Webhook"""
+    """處理 Telegram Webhook（立即回應，指令交由背景執行緒處理）"""
     try:
         update = request.get_json()
-        
+        WEBHOOK_POOL.submit(_dispatch, update)
+        return json_response({'status': 'ok'})
+    
+    except Exception as e:
+        logger.error(f"Webhook 處理錯誤: {e}")
+        return json_response({'status': 'error', 'message': str(e)}, 500)
+
+
+def _dispatch(update):
+    """分派 Telegram 更新至對應的指令處理函數"""
+    try:
         if 'message' in update:
             message = update['message']
             chat_id = message['chat']['id']
             user_id = message['from']['id']
             text = message.get('text', '')
             
+            # 一般聊天文字直接略過，不進入正則比對
+            if not text.startswith('/'):
+                return
+            
             # 處理指令
-            if text.startswith('/'):
-                parts = text.split()
-                command = parts[0].lower()
+            match = _CMD_RE.match(text)
+            if match:
+                command = match.group(1).lower()
+                rest = match.group(2)
+                # 僅有參數時才切割；parts[0] 為不含 @BotName 的指令
+                parts = [command, *rest.split()] if rest else [command]
                 
-                if command == '/start':
-                    handle_start(chat_id, user_id)
-                elif command == '/help':
-                    handle_help(chat_id)
-                elif command == '/analyze':
-                    if len(parts) > 1:
-                        handle_analyze(chat_id, user_id, parts[1])
-                    else:
-                        send_message(chat_id, "請指定幣種，例如: /analyze BTC")
-                elif command == '/price':
-                    if len(parts) > 1:
-                        handle_price(chat_id, parts[1])
-                    else:
-                        send_message(chat_id, "請指定幣種，例如: /price BTC")
-                elif command == '/top':
-                    handle_top(chat_id)
-                elif command == '/news':
-                    handle_news(chat_id)
-                elif command == '/trend':
-                    if len(parts) > 1:
-                        handle_trend(chat_id, parts[1])
-                    else:
-                        handle_trend(chat_id)
-                elif command == '/alert':
-                    handle_alert(chat_id, user_id, parts)
-                elif command == '/myalerts':
-                    handle_my_alerts(chat_id, user_id)
-                elif command == '/del_alert':
-                    handle_del_alert(chat_id, user_id, parts)
+                handler = COMMANDS.get(command)
+                if handler:
+                    handler(chat_id, user_id, parts)
                 else:
-                    send_message(chat_id, "❌ 未知指令\n\n輸入 /help 查看可用指令")
-        
-        return jsonify({'status': 'ok'})
+                    send_message(chat_id, UNKNOWN_COMMAND_TEXT)
+            else:
+                # 以 / 開頭但格式不符（如 /price-btc、單獨的 /）同樣視為未知指令
+                send_message(chat_id, UNKNOWN_COMMAND_TEXT)
     
     except Exception as e:
-        logger.error(f"Webhook 處理錯誤: {e}")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+        logger.error(f"指令處理錯誤: {e}")
 
 
 @app.route('/health', methods=['GET'])
 def health():
     """健康檢查"""
-    return jsonify({
+    return json_response({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat()
     })
@@ -4,15 +4,47 @@
 """
 import pandas as pd
 import numpy as np
-from ta.momentum import RSIIndicator
-from ta.trend import MACD
-from ta.volatility import BollingerBands
 from typing import Dict, Optional
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# analyze() 結果快取上限 (同一根 K 線重複分析時直接回傳)
+ANALYZE_CACHE_SIZE = 128
+
+
+def _scan_buy(rsi, close, bb_lower, macd, macd_signal, volume_ratio,
+              rsi_threshold, volume_threshold):
+    """
+    以 numpy 陣列檢查最後兩根 K 線的買入條件
+    
+    Returns:
+        (RSI 超賣, 布林帶反彈, MACD 金叉, 成交量放大)
+    """
+    rsi_oversold = bool(rsi[-1] < rsi_threshold)
+    # 布林帶反彈：前一根 K 線觸及下軌，當前 K 線收盤高於下軌
+    bb_bounce = bool(close[-2] <= bb_lower[-2] and close[-1] > bb_lower[-1])
+    # MACD 金叉：MACD 線從下方穿越信號線
+    macd_cross = bool(macd[-2] <= macd_signal[-2] and macd[-1] > macd_signal[-1])
+    volume_surge = bool(volume_ratio[-1] > volume_threshold)
+    return rsi_oversold, bb_bounce, macd_cross, volume_surge
+
+
+def _scan_sell(rsi, close, bb_upper, macd, macd_signal, macd_diff, rsi_threshold):
+    """
+    以 numpy 陣列檢查最後兩根 K 線的賣出條件
+    
+    Returns:
+        (RSI 超買, 觸及布林帶上軌, MACD 死叉, MACD 柱狀圖轉負)
+    """
+    rsi_overbought = bool(rsi[-1] > rsi_threshold)
+    bb_top = bool(close[-1] >= bb_upper[-1])
+    # MACD 死叉：MACD 線從上方穿越信號線
+    macd_cross = bool(macd[-2] >= macd_signal[-2] and macd[-1] < macd_signal[-1])
+    macd_histogram_negative = bool(macd_diff[-1] < 0 and macd_diff[-2] > 0)
+    return rsi_overbought, bb_top, macd_cross, macd_histogram_negative
+
 
 class SignalGenerator:
     """交易信號生成器"""
@@ -29,6 +61,8 @@ class SignalGenerator:
         self.macd_config = config['indicators']['macd']
         self.bb_config = config['indicators']['bollinger_bands']
         self.volume_config = config['indicators']['volume']
+        # (symbol, 最後一根 K 線時間, 收盤價) -> analyze() 結果
+        self._analyze_cache = {}
         
     def calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -40,33 +74,39 @@ class SignalGenerator:
         Returns:
             添加了技術指標的 DataFrame
         """
-        # RSI
-        rsi_indicator = RSIIndicator(
-            close=df['close'], 
-            window=self.rsi_config['period']
-        )
-        df['rsi'] = rsi_indicator.rsi()
+        close = df['close'].astype('float64')
+        
+        # RSI (Wilder 平滑：alpha = 1 / period)
+        period = self.rsi_config['period']
+        diff = close.diff()
+        gain = diff.where(diff > 0, 0.0)
+        loss = -diff.where(diff < 0, 0.0)
+        avg_gain = gain.ewm(alpha=1 / period, min_periods=period, adjust=False).mean()
+        avg_loss = loss.ewm(alpha=1 / period, min_periods=period, adjust=False).mean()
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+        # 無下跌時 RSI 為 100
+        df['rsi'] = rsi.where(avg_loss != 0, 100.0)
         
         # MACD
-        macd_indicator = MACD(
-            close=df['close'],
-            window_fast=self.macd_config['fast_period'],
-            window_slow=self.macd_config['slow_period'],
-            window_sign=self.macd_config['signal_period']
-        )
-        df['macd'] = macd_indicator.macd()
-        df['macd_signal'] = macd_indicator.macd_signal()
-        df['macd_diff'] = macd_indicator.macd_diff()
-        
-        # 布林帶
-        bb_indicator = BollingerBands(
-            close=df['close'],
-            window=self.bb_config['period'],
-            window_dev=self.bb_config['std_dev']
-        )
-        df['bb_upper'] = bb_indicator.bollinger_hband()
-        df['bb_middle'] = bb_indicator.bollinger_mavg()
-        df['bb_lower'] = bb_indicator.bollinger_lband()
+        fast = self.macd_config['fast_period']
+        slow = self.macd_config['slow_period']
+        sign = self.macd_config['signal_period']
+        ema_fast = close.ewm(span=fast, min_periods=fast, adjust=False).mean()
+        ema_slow = close.ewm(span=slow, min_periods=slow, adjust=False).mean()
+        macd = ema_fast - ema_slow
+        macd_signal = macd.ewm(span=sign, min_periods=sign, adjust=False).mean()
+        df['macd'] = macd
+        df['macd_signal'] = macd_signal
+        df['macd_diff'] = macd - macd_signal
+        
+        # 布林帶 (母體標準差)
+        window = self.bb_config['period']
+        rolling = close.rolling(window=window, min_periods=window)
+        bb_middle = rolling.mean()
+        bb_width = rolling.std(ddof=0) * self.bb_config['std_dev']
+        df['bb_upper'] = bb_middle + bb_width
+        df['bb_middle'] = bb_middle
+        df['bb_lower'] = bb_middle - bb_width
         
         # 成交量移動平均
         df['volume_ma'] = df['volume'].rolling(window=20).mean()
@@ -93,53 +133,44 @@ class SignalGenerator:
         if len(df) < 2:
             return None
         
-        latest = df.iloc[-1]
-        previous = df.iloc[-2]
+        # 只取出需要的欄位 (numpy 陣列)，避免逐列建立 Series
+        rsi = df['rsi'].to_numpy()
+        close = df['close'].to_numpy()
+        macd = df['macd'].to_numpy()
+        macd_signal = df['macd_signal'].to_numpy()
+        volume_ratio = df['volume_ratio'].to_numpy()
         
-        # 條件檢查
-        rsi_oversold = latest['rsi'] < self.rsi_config['oversold']
-        
-        # 布林帶反彈：前一根 K 線觸及下軌，當前 K 線收盤高於下軌
-        bb_bounce = (
-            previous['close'] <= previous['bb_lower'] and
-            latest['close'] > latest['bb_lower']
-        )
-        
-        # MACD 金叉：MACD 線從下方穿越信號線
-        macd_cross = (
-            previous['macd'] <= previous['macd_signal'] and
-            latest['macd'] > latest['macd_signal']
+        rsi_oversold, bb_bounce, macd_cross, volume_surge = _scan_buy(
+            rsi, close, df['bb_lower'].to_numpy(), macd, macd_signal, volume_ratio,
+            self.rsi_config['oversold'], self.volume_config['surge_threshold']
         )
         
-        # 成交量放大
-        volume_surge = latest['volume_ratio'] > self.volume_config['surge_threshold']
-        
         # 計算信號強度（滿足的條件數量）
-        conditions_met = sum([rsi_oversold, bb_bounce, macd_cross, volume_surge])
+        conditions_met = rsi_oversold + bb_bounce + macd_cross + volume_surge
         
         # 至少滿足 3 個條件才發出信號
         if conditions_met >= 3:
             signal = {
                 'type': 'BUY',
-                'price': latest['close'],
-                'timestamp': latest['timestamp'],
-                'rsi': round(latest['rsi'], 2),
-                'macd': round(latest['macd'], 4),
-                'macd_signal': round(latest['macd_signal'], 4),
-                'volume_ratio': round(latest['volume_ratio'], 2),
+                'price': close[-1],
+                'timestamp': df['timestamp'].iat[-1],
+                'rsi': round(rsi[-1], 2),
+                'macd': round(macd[-1], 4),
+                'macd_signal': round(macd_signal[-1], 4),
+                'volume_ratio': round(volume_ratio[-1], 2),
                 'conditions_met': conditions_met,
                 'strength': 'STRONG' if conditions_met == 4 else 'MODERATE',
                 'reasons': []
             }
             
             if rsi_oversold:
-                signal['reasons'].append(f"RSI 超賣 ({round(latest['rsi'], 2)})")
+                signal['reasons'].append(f"RSI 超賣 ({round(rsi[-1], 2)})")
             if bb_bounce:
                 signal['reasons'].append("布林帶下軌反彈")
             if macd_cross:
                 signal['reasons'].append("MACD 金叉")
             if volume_surge:
-                signal['reasons'].append(f"成交量放大 ({round(latest['volume_ratio'], 2)}x)")
+                signal['reasons'].append(f"成交量放大 ({round(volume_ratio[-1], 2)}x)")
             
             logger.info(f"檢測到買入信號: {signal}")
             return signal
@@ -165,44 +196,36 @@ class SignalGenerator:
         if len(df) < 2:
             return None
         
-        latest = df.iloc[-1]
-        previous = df.iloc[-2]
-        
-        # 條件檢查
-        rsi_overbought = latest['rsi'] > self.rsi_config['overbought']
+        rsi = df['rsi'].to_numpy()
+        close = df['close'].to_numpy()
+        macd = df['macd'].to_numpy()
+        macd_signal = df['macd_signal'].to_numpy()
         
-        # 觸及布林帶上軌
-        bb_top = latest['close'] >= latest['bb_upper']
-        
-        # MACD 死叉：MACD 線從上方穿越信號線
-        macd_cross = (
-            previous['macd'] >= previous['macd_signal'] and
-            latest['macd'] < latest['macd_signal']
+        rsi_overbought, bb_top, macd_cross, macd_histogram_negative = _scan_sell(
+            rsi, close, df['bb_upper'].to_numpy(), macd, macd_signal,
+            df['macd_diff'].to_numpy(), self.rsi_config['overbought']
         )
         
-        # MACD 柱狀圖轉負
-        macd_histogram_negative = latest['macd_diff'] < 0 and previous['macd_diff'] > 0
-        
         # 計算信號強度
-        conditions_met = sum([rsi_overbought, bb_top, macd_cross, macd_histogram_negative])
+        conditions_met = rsi_overbought + bb_top + macd_cross + macd_histogram_negative
         
         # 至少滿足 2 個條件才發出信號
         if conditions_met >= 2:
             signal = {
                 'type': 'SELL',
-                'price': latest['close'],
-                'timestamp': latest['timestamp'],
-                'rsi': round(latest['rsi'], 2),
-                'macd': round(latest['macd'], 4),
-                'macd_signal': round(latest['macd_signal'], 4),
-                'volume_ratio': round(latest['volume_ratio'], 2),
+                'price': close[-1],
+                'timestamp': df['timestamp'].iat[-1],
+                'rsi': round(rsi[-1], 2),
+                'macd': round(macd[-1], 4),
+                'macd_signal': round(macd_signal[-1], 4),
+                'volume_ratio': round(df['volume_ratio'].iat[-1], 2),
                 'conditions_met': conditions_met,
                 'strength': 'STRONG' if conditions_met >= 3 else 'MODERATE',
                 'reasons': []
             }
             
             if rsi_overbought:
-                signal['reasons'].append(f"RSI 超買 ({round(latest['rsi'], 2)})")
+                signal['reasons'].append(f"RSI 超買 ({round(rsi[-1], 2)})")
             if bb_top:
                 signal['reasons'].append("觸及布林帶上軌")
             if macd_cross:
@@ -215,16 +238,25 @@ class SignalGenerator:
         
         return None
     
-    def analyze(self, df: pd.DataFrame) -> Dict:
+    def analyze(self, df: pd.DataFrame, symbol: Optional[str] = None) -> Dict:
         """
         分析市場數據並生成交易信號
         
         Args:
             df: 原始 OHLCV 數據
+            symbol: 交易對；提供時，同一根 K 線的重複分析會直接使用快取結果
             
         Returns:
             包含分析結果的字典
         """
+        cache_key = None
+        if symbol is not None:
+            # 加入收盤價：未收盤的 K 線時間相同但價格仍在變動
+            cache_key = (symbol, df['timestamp'].iat[-1], df['close'].iat[-1])
+            cached = self._analyze_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         # 計算指標
         df = self.calculate_indicators(df)
         
@@ -232,17 +264,21 @@ class SignalGenerator:
         buy_signal = self.detect_buy_signal(df)
         sell_signal = self.detect_sell_signal(df)
         
-        latest = df.iloc[-1]
-        
         result = {
-            'timestamp': latest['timestamp'],
-            'price': latest['close'],
-            'rsi': round(latest['rsi'], 2),
-            'macd': round(latest['macd'], 4),
-            'macd_signal': round(latest['macd_signal'], 4),
+            'timestamp': df['timestamp'].iat[-1],
+            'price': df['close'].iat[-1],
+            'rsi': round(df['rsi'].iat[-1], 2),
+            'macd': round(df['macd'].iat[-1], 4),
+            'macd_signal': round(df['macd_signal'].iat[-1], 4),
             'buy_signal': buy_signal,
             'sell_signal': sell_signal,
             'has_signal': buy_signal is not None or sell_signal is not None
         }
         
+        if cache_key is not None:
+            if len(self._analyze_cache) >= ANALYZE_CACHE_SIZE:
+                # 移除最早寫入的項目
+                self._analyze_cache.pop(next(iter(self._analyze_cache)))
+            self._analyze_cache[cache_key] = result
+        
         return result
@@ -9,64 +9,210 @@
 - 支撐阻力位
 """
 
+import os
+import sqlite3
+import orjson
 import requests
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
 from typing import Dict, List, Optional
 import numpy as np
 
+# 歷史價格快取 ((coin_id, days) -> (快取時間, 價格列表))，日線資料一分鐘內不會變動
+HISTORY_CACHE_TTL = 60
+HISTORY_CACHE_MAXSIZE = 128
+_history_cache = {}
+_history_cache_lock = threading.Lock()
+
+# 已收盤的日線收盤價存於本機 SQLite，之後只需抓取當日最新價格
+HISTORY_DB_PATH = os.getenv('PRICE_HISTORY_DB', os.path.join('data', 'price_history.db'))
+_history_db_ready = False
+_history_db_lock = threading.Lock()
+
+# 常用幣種代碼 -> CoinGecko ID，所有實例共用且唯讀
+SYMBOL_MAP = MappingProxyType({
+    'BTC': 'bitcoin',
+    'ETH': 'ethereum',
+    'BNB': 'binancecoin',
+    'SOL': 'solana',
+    'XRP': 'ripple',
+    'ADA': 'cardano',
+})
+
+# 同時收錄大寫與小寫代碼，命中時不必再轉換大小寫
+_COIN_ID_LOOKUP = MappingProxyType({
+    **SYMBOL_MAP,
+    **{symbol.lower(): coin_id for symbol, coin_id in SYMBOL_MAP.items()},
+})
+
 class TechnicalAnalyzer:
     """技術分析工具"""
     
+    __slots__ = ('coingecko_base', 'session')
+    
+    symbol_map = SYMBOL_MAP
+    
     def __init__(self):
         self.coingecko_base = "https://api.coingecko.com/api/v3"
         
-        self.symbol_map = {
-            'BTC': 'bitcoin',
-            'ETH': 'ethereum',
-            'BNB': 'binancecoin',
-            'SOL': 'solana',
-            'XRP': 'ripple',
-            'ADA': 'cardano',
-        }
+        # 共用 HTTP Session (keep-alive 連線池，避免每次請求重新 TCP + TLS 握手)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+        ))
     
     def get_coin_id(self, symbol: str) -> str:
         """轉換幣種代碼"""
-        symbol = symbol.upper()
-        return self.symbol_map.get(symbol, symbol.lower())
+        coin_id = _COIN_ID_LOOKUP.get(symbol)
+        if coin_id is None:
+            coin_id = _COIN_ID_LOOKUP.get(symbol.upper(), symbol.lower())
+        return coin_id
+    
+    def _history_db(self):
+        """開啟日線資料庫；目錄與資料表只在第一次使用時建立"""
+        global _history_db_ready
+        if not _history_db_ready:
+            with _history_db_lock:
+                if not _history_db_ready:
+                    db_dir = os.path.dirname(HISTORY_DB_PATH)
+                    if db_dir:
+                        os.makedirs(db_dir, exist_ok=True)
+                    with sqlite3.connect(HISTORY_DB_PATH) as conn:
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS daily_closes ("
+                            "coin_id TEXT NOT NULL, day TEXT NOT NULL, close REAL NOT NULL, "
+                            "PRIMARY KEY (coin_id, day))"
+                        )
+                    conn.close()
+                    _history_db_ready = True
+        return sqlite3.connect(HISTORY_DB_PATH)
+    
+    def _load_daily_closes(self, coin_id: str, days: int) -> List[float]:
+        """讀取最近 days 天內已收盤的日線收盤價 (不含今天)"""
+        today = datetime.now(timezone.utc).date()
+        since = (today - timedelta(days=days)).isoformat()
+        try:
+            conn = self._history_db()
+            try:
+                rows = conn.execute(
+                    "SELECT close FROM daily_closes WHERE coin_id = ? AND day >= ? AND day < ? ORDER BY day",
+                    (coin_id, since, today.isoformat())
+                ).fetchall()
+            finally:
+                conn.close()
+            return [row[0] for row in rows]
+        except Exception as e:
+            print(f"⚠️ 讀取日線快取失敗: {e}")
+            return []
+    
+    def _save_daily_closes(self, coin_id: str, points: List[List[float]]):
+        """保存已收盤的日線收盤價；今天的資料仍在變動，不寫入"""
+        today = datetime.now(timezone.utc).date()
+        rows = []
+        for ts, price in points:
+            day = datetime.fromtimestamp(ts / 1000, tz=timezone.utc).date()
+            if day < today:
+                rows.append((coin_id, day.isoformat(), price))
+        if not rows:
+            return
+        try:
+            conn = self._history_db()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO daily_closes (coin_id, day, close) VALUES (?, ?, ?)",
+                        rows
+                    )
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"⚠️ 保存日線快取失敗: {e}")
     
     def fetch_price_history(self, symbol: str, days: int = 30) -> Optional[List[float]]:
-        """獲取歷史價格"""
+        """獲取歷史價格
+        
+        本機已有完整的已收盤日線時只向 API 抓取最近一天，其餘由 SQLite 補齊
+        """
+        coin_id = self.get_coin_id(symbol)
+        cache_key = (coin_id, days)
+        with _history_cache_lock:
+            cached = _history_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < HISTORY_CACHE_TTL:
+            return cached[1]
+        
         try:
-            coin_id = self.get_coin_id(symbol)
+            stored = self._load_daily_closes(coin_id, days)
+            fetch_days = 1 if len(stored) >= days else days
+            
             url = f"{self.coingecko_base}/coins/{coin_id}/market_chart"
             params = {
                 'vs_currency': 'usd',
-                'days': days,
+                'days': fetch_days,
                 'interval': 'daily'
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
-            prices = [p[1] for p in data.get('prices', [])]
-            return prices if prices else None
+            points = data.get('prices', [])
+            if not points:
+                return cached[1] if cached else None
+            
+            self._save_daily_closes(coin_id, points)
+            if fetch_days == days:
+                prices = [p[1] for p in points]
+            else:
+                # 已收盤日線 + 今天的最新價格，長度與完整查詢一致
+                today = datetime.now(timezone.utc).date()
+                latest = [
+                    p[1] for p in points
+                    if datetime.fromtimestamp(p[0] / 1000, tz=timezone.utc).date() >= today
+                ]
+                prices = (stored + latest)[-(days + 1):]
+            
+            with _history_cache_lock:
+                if len(_history_cache) >= HISTORY_CACHE_MAXSIZE and cache_key not in _history_cache:
+                    # 移除最早寫入的項目
+                    _history_cache.pop(next(iter(_history_cache)))
+                _history_cache[cache_key] = (time.monotonic(), prices)
+            return prices
             
         except Exception as e:
             print(f"❌ 獲取歷史數據失敗: {e}")
-            return None
+            # 限流或暫時失敗時沿用過期的舊資料
+            return cached[1] if cached else None
     
     def calculate_rsi(self, prices: List[float], period: int = 14) -> Optional[float]:
-        """計算 RSI 指標"""
+        """計算 RSI 指標 (Wilder 平滑)"""
         if len(prices) < period + 1:
             return None
         
-        deltas = np.diff(prices)
-        gains = np.where(deltas > 0, deltas, 0)
-        losses = np.where(deltas < 0, -deltas, 0)
+        deltas = np.diff(np.asarray(prices, dtype=np.float64))
+        return self._rsi_from_deltas(deltas, period)
+    
+    @staticmethod
+    def _rsi_from_deltas(deltas: np.ndarray, period: int = 14) -> float:
+        """由漲跌幅計算 RSI
+        
+        以前 period 個漲跌幅的簡單平均為起點，之後每根 K 線依 Wilder 平滑遞推：
+        avg = (avg * (period - 1) + x) / period
+        """
+        # 各一次走訪、一次配置，不需額外的布林遮罩
+        gains = np.maximum(deltas, 0.0)
+        losses = np.maximum(-deltas, 0.0)
         
-        avg_gain = np.mean(gains[-period:])
-        avg_loss = np.mean(losses[-period:])
+        avg_gain = float(np.mean(gains[:period]))
+        avg_loss = float(np.mean(losses[:period]))
+        for gain, loss in zip(gains[period:].tolist(), losses[period:].tolist()):
+            avg_gain = (avg_gain * (period - 1) + gain) / period
+            avg_loss = (avg_loss * (period - 1) + loss) / period
         
         if avg_loss == 0:
             return 100
@@ -91,9 +237,11 @@ class TechnicalAnalyzer:
         recent = prices[-7:]  # 最近7天
         older = prices[-14:-7]  # 之前7天
         
-        recent_avg = np.mean(recent)
-        older_avg = np.mean(older)
-        
+        return self._trend_label(np.mean(recent), np.mean(older))
+    
+    @staticmethod
+    def _trend_label(recent_avg: float, older_avg: float) -> str:
+        """依近 7 日與前 7 日均價變化判斷趨勢"""
         change = ((recent_avg - older_avg) / older_avg) * 100
         
         if change > 5:
@@ -109,17 +257,20 @@ class TechnicalAnalyzer:
     
     def find_support_resistance(self, prices: List[float]) -> Dict:
         """尋找支撐與阻力位"""
-        if len(prices) < 30:
-            return {'support': None, 'resistance': None}
-        
-        recent = prices[-30:]
-        current = prices[-1]
+        return self._support_resistance(prices[-30:], prices[-1] if prices else None)
+    
+    @staticmethod
+    def _support_resistance(recent, current: float) -> Dict:
+        """以最近 30 天價格計算支撐位 / 阻力位及與現價的距離，不足 30 天時各欄位為 None"""
+        if len(recent) < 30:
+            return {'support': None, 'resistance': None,
+                    'distance_to_support': None, 'distance_to_resistance': None}
         
         # 支撐位：最近30天的最低價附近
-        support = round(min(recent), 2)
+        support = round(float(min(recent)), 2)
         
         # 阻力位：最近30天的最高價附近
-        resistance = round(max(recent), 2)
+        resistance = round(float(max(recent)), 2)
         
         return {
             'support': support,
@@ -134,14 +285,28 @@ class TechnicalAnalyzer:
         if not prices:
             return None
         
+        # 一次轉為陣列，所有指標共用同一組切片
+        arr = np.asarray(prices, dtype=np.float64)
+        n = len(arr)
         current_price = prices[-1]
         
-        # 計算各項指標
-        rsi = self.calculate_rsi(prices)
-        ma7 = self.calculate_ma(prices, 7)
-        ma30 = self.calculate_ma(prices, 30)
-        trend = self.analyze_trend(prices)
-        sr = self.find_support_resistance(prices)
+        # RSI(14)：Wilder 平滑需要完整的漲跌幅序列
+        rsi = self._rsi_from_deltas(np.diff(arr)) if n >= 15 else None
+        
+        # MA7 同時作為趨勢判斷的近 7 日均價
+        recent_avg = arr[-7:].mean() if n >= 7 else None
+        ma7 = round(recent_avg, 2) if recent_avg is not None else None
+        
+        last30 = arr[-30:]
+        ma30 = round(last30.mean(), 2) if n >= 30 else None
+        
+        if recent_avg is None:
+            trend = "數據不足"
+        else:
+            trend = self._trend_label(recent_avg, np.mean(arr[-14:-7]))
+        
+        # 支撐位 / 阻力位：最近30天的最低價 / 最高價
+        sr = self._support_resistance(last30, current_price)
         
         # RSI 信號
         if rsi:
@@ -188,26 +353,28 @@ class TechnicalAnalysisFormatter:
         if not data:
             return "❌ 分析失敗"
         
-        msg = f"<b>📊 技術分析報告 - {data['symbol']}</b>\n\n"
-        msg += f"💵 <b>當前價格</b>: ${data['current_price']:,.2f}\n\n"
-        
-        msg += "<b>📈 技術指標</b>\n"
-        msg += f"• RSI(14): {data['rsi']} ({data['rsi_signal']})\n"
-        msg += f"• MA7: ${data['ma7']:,.2f}\n"
-        msg += f"• MA30: ${data['ma30']:,.2f}\n"
-        msg += f"• 均線狀態: {data['ma_signal']}\n\n"
-        
-        msg += "<b>🎯 趨勢分析</b>\n"
-        msg += f"• 短期趨勢: {data['trend']}\n\n"
-        
-        msg += "<b>📍 支撐與阻力</b>\n"
-        msg += f"• 支撐位: ${data['support']:,.2f} "
-        msg += f"({data['distance_to_support']:+.1f}%)\n"
-        msg += f"• 阻力位: ${data['resistance']:,.2f} "
-        msg += f"({data['distance_to_resistance']:+.1f}%)\n\n"
-        
-        # 綜合建議
-        msg += "<b>💡 綜合評估</b>\n"
+        parts = [
+            f"<b>📊 技術分析報告 - {data['symbol']}</b>\n\n",
+            f"💵 <b>當前價格</b>: ${data['current_price']:,.2f}\n\n",
+            
+            "<b>📈 技術指標</b>\n",
+            f"• RSI(14): {data['rsi']} ({data['rsi_signal']})\n",
+            f"• MA7: ${data['ma7']:,.2f}\n",
+            f"• MA30: ${data['ma30']:,.2f}\n",
+            f"• 均線狀態: {data['ma_signal']}\n\n",
+            
+            "<b>🎯 趨勢分析</b>\n",
+            f"• 短期趨勢: {data['trend']}\n\n",
+            
+            "<b>📍 支撐與阻力</b>\n",
+            f"• 支撐位: ${data['support']:,.2f} ",
+            f"({data['distance_to_support']:+.1f}%)\n",
+            f"• 阻力位: ${data['resistance']:,.2f} ",
+            f"({data['distance_to_resistance']:+.1f}%)\n\n",
+            
+            # 綜合建議
+            "<b>💡 綜合評估</b>\n",
+        ]
         
         signals = []
         if data['rsi']:
@@ -222,14 +389,13 @@ class TechnicalAnalysisFormatter:
             signals.append("均線空頭排列")
         
         if signals:
-            for signal in signals:
-                msg += f"• {signal}\n"
+            parts.extend(f"• {signal}\n" for signal in signals)
         else:
-            msg += "• 市場處於觀望狀態\n"
+            parts.append("• 市場處於觀望狀態\n")
         
-        msg += "\n⚠️ 僅供參考，投資需謹慎"
+        parts.append("\n⚠️ 僅供參考，投資需謹慎")
         
-        return msg
+        return "".join(parts)
 
 
 # 使用範例
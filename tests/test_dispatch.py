@@ -0,0 +1,51 @@
+"""
+指令分派測試：格式不符的斜線指令回覆未知指令，一般聊天文字不回覆
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, PROJECT_ROOT)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """在暫存目錄載入 server，並攔截 send_message 記錄回覆內容"""
+    shutil.copy(os.path.join(PROJECT_ROOT, 'database_schema.sql'), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('TELEGRAM_BOT_TOKEN', 'test-token')
+    from src import server as server_module
+    sent = []
+    monkeypatch.setattr(server_module, 'send_message',
+                        lambda chat_id, text, *args, **kwargs: sent.append((chat_id, text)))
+    return server_module, sent
+
+
+def _update(text):
+    return {'message': {'chat': {'id': 1}, 'from': {'id': 2}, 'text': text}}
+
+
+@pytest.mark.parametrize('text', ['/price-btc', '/price,btc', '/start@', '/'])
+def test_malformed_command_replies_unknown(server, text):
+    """以 / 開頭但無法解析的文字回覆未知指令"""
+    module, sent = server
+    module._dispatch(_update(text))
+    assert sent == [(1, module.UNKNOWN_COMMAND_TEXT)]
+
+
+def test_unknown_command_replies_unknown(server):
+    """格式正確但不存在的指令回覆未知指令"""
+    module, sent = server
+    module._dispatch(_update('/nosuchcommand btc'))
+    assert sent == [(1, module.UNKNOWN_COMMAND_TEXT)]
+
+
+def test_plain_text_is_ignored(server):
+    """一般聊天文字不回覆"""
+    module, sent = server
+    module._dispatch(_update('hello'))
+    assert sent == []
@@ -0,0 +1,115 @@
+"""
+Telegram 發送佇列測試：訊息合併、同一聊天的送達順序與令牌桶限速
+"""
+
+import os
+import shutil
+import sys
+import threading
+import time
+
+import pytest
+
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, PROJECT_ROOT)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """在暫存目錄載入 server，避免全域資料庫寫入專案內的 crypto_bot.db"""
+    shutil.copy(os.path.join(PROJECT_ROOT, 'database_schema.sql'), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('TELEGRAM_BOT_TOKEN', 'test-token')
+    from src import server as server_module
+    monkeypatch.setattr(server_module, 'TELEGRAM_BOT_TOKEN', 'test-token')
+    return server_module
+
+
+def test_merge_outgoing_groups_consecutive_messages(server):
+    """同一聊天、同一格式的連續訊息合併為一組，不同聊天互不影響"""
+    batch = [
+        (1, 'a', 'HTML'),
+        (2, 'x', 'HTML'),
+        (1, 'b', 'HTML'),
+    ]
+    merged = server._merge_outgoing(batch)
+    assert merged == {
+        1: [('HTML', ['a', 'b'])],
+        2: [('HTML', ['x'])],
+    }
+
+
+def test_merge_outgoing_keeps_order_across_parse_modes(server):
+    """格式不同的訊息不合併，並保持原本的先後順序"""
+    batch = [
+        (1, 'a', 'HTML'),
+        (1, 'b', 'Markdown'),
+        (1, 'c', 'HTML'),
+    ]
+    merged = server._merge_outgoing(batch)
+    assert merged[1] == [('HTML', ['a']), ('Markdown', ['b']), ('HTML', ['c'])]
+
+
+def test_merge_outgoing_respects_length_limit(server):
+    """合併後超過 Telegram 長度上限時另起一組"""
+    half = 'x' * (server.TELEGRAM_MAX_MESSAGE_LENGTH // 2)
+    batch = [(1, half, 'HTML'), (1, half, 'HTML')]
+    merged = server._merge_outgoing(batch)
+    assert merged[1] == [('HTML', [half]), ('HTML', [half])]
+    for _, texts in merged[1]:
+        assert len(server.MESSAGE_SEPARATOR.join(texts)) <= server.TELEGRAM_MAX_MESSAGE_LENGTH
+
+
+def test_send_merged_falls_back_to_single_messages(server, monkeypatch):
+    """合併後的訊息被 Telegram 拒絕時，改為逐則發送"""
+    sent = []
+
+    def fake_post(chat_id, text, parse_mode='HTML', parse_response=False):
+        sent.append(text)
+        return server.TELEGRAM_BAD_REQUEST if server.MESSAGE_SEPARATOR in text else 200
+
+    monkeypatch.setattr(server, '_post_message', fake_post)
+    server._send_merged(1, ['a', 'b'], 'HTML')
+    assert sent == ['a\n\nb', 'a', 'b']
+
+
+def test_outbox_preserves_order_per_chat(server, monkeypatch):
+    """同一聊天跨批次的訊息依送入順序送達"""
+    received = {}
+    done = threading.Event()
+    total = 40
+
+    def fake_post(chat_id, text, parse_mode='HTML', parse_response=False):
+        # 模擬網路延遲，讓不同批次有機會同時發送
+        time.sleep(0.005)
+        received.setdefault(chat_id, []).extend(text.split(server.MESSAGE_SEPARATOR))
+        if sum(map(len, received.values())) == total:
+            done.set()
+        return 200
+
+    monkeypatch.setattr(server, '_post_message', fake_post)
+    for i in range(total // 2):
+        for chat_id in (1, 2):
+            server.send_message(chat_id, str(i))
+        time.sleep(0.002)
+
+    assert done.wait(5)
+    expected = [str(i) for i in range(total // 2)]
+    assert received == {1: expected, 2: expected}
+
+
+def test_send_slot_limits_rate(server, monkeypatch):
+    """令牌桶用完後，每則訊息需等待 1 / TELEGRAM_RATE_LIMIT 秒"""
+    waits = []
+    monkeypatch.setattr(server.time, 'sleep', waits.append)
+    monkeypatch.setattr(server, 'TELEGRAM_RATE_LIMIT', 10)
+    monkeypatch.setattr(server, '_send_tokens', 10.0)
+    monkeypatch.setattr(server, '_send_tokens_ts', time.monotonic())
+
+    for _ in range(13):
+        server._acquire_send_slot()
+
+    # 前 10 則立即送出，之後依序預約下一個令牌
+    assert len(waits) == 3
+    assert waits == sorted(waits)
+    assert waits[-1] == pytest.approx(0.3, abs=0.05)
@@ -0,0 +1,56 @@
+"""
+訂閱管理測試：單筆 / 批量新增的上限檢查與既有訂閱的原地更新
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, PROJECT_ROOT)
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """在暫存目錄建立資料庫，避免全域資料庫寫入專案內的 crypto_bot.db"""
+    shutil.copy(os.path.join(PROJECT_ROOT, 'database_schema.sql'), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    from src.database import DatabaseManager
+    db = DatabaseManager(str(tmp_path / 'test.db'))
+    monkeypatch.setattr(db, 'MAX_SUBSCRIPTIONS_PER_USER', 3)
+    return db
+
+
+def _conditions(db, user_id):
+    return {row['symbol']: row['condition'] for row in db.get_user_subscriptions(user_id)}
+
+
+def test_add_subscriptions_stops_at_cap(manager):
+    """超過上限的新幣種被略過，回傳實際寫入筆數"""
+    added = manager.add_subscriptions(1, [('btc', None), ('eth', None), ('sol', None), ('doge', None)])
+    assert added == 3
+    assert set(_conditions(manager, 1)) == {'BTC', 'ETH', 'SOL'}
+
+
+def test_add_subscriptions_updates_existing_symbol_at_cap(manager):
+    """已訂閱的幣種即使已達上限也能更新條件，且保留原本的建立時間"""
+    manager.add_subscriptions(1, [('btc', 'a'), ('eth', None), ('sol', None)])
+    conn = manager.get_connection()
+    conn.execute("UPDATE subscriptions SET created_at = '2000-01-01 00:00:00' WHERE symbol = 'BTC'")
+
+    added = manager.add_subscriptions(1, [('btc', 'b'), ('doge', None)])
+
+    assert added == 1
+    assert _conditions(manager, 1) == {'BTC': 'b', 'ETH': None, 'SOL': None}
+    created_at = conn.execute("SELECT created_at FROM subscriptions WHERE symbol = 'BTC'").fetchone()[0]
+    assert created_at == '2000-01-01 00:00:00'
+
+
+def test_add_subscriptions_cap_is_per_user(manager):
+    """上限依用戶分別計算"""
+    manager.add_subscriptions(1, [('btc', None), ('eth', None), ('sol', None)])
+    assert manager.add_subscriptions(2, [('btc', None)]) == 1
+    assert manager.add_subscription(1, 'doge') is False
+    assert manager.add_subscription(1, 'eth', 'x') is True
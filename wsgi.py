@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+WSGI 入口 (Gunicorn + gevent worker)
+
+gunicorn -c gunicorn_conf.py wsgi:app
+
+- 在載入任何網路相關模組前先 monkey patch，讓 requests / feedparser
+  的對外 HTTPS 呼叫變成 greenlet 讓出，而不是佔住執行緒
+- 定時任務 (APScheduler) 仍由 main.py 啟動，避免多個 worker 重複排程
+"""
+
+from gevent import monkey
+
+monkey.patch_all()
+
+import os
+import sys
+import logging
+from dotenv import load_dotenv
+
+# 確保專案根目錄在 Python 路徑中
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# 加載環境變數
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+from src.server import app, init_app_monitor
+
+try:
+    init_app_monitor()
+except Exception as e:
+    logger.warning(f"⚠️  監控初始化警告: {e}")
+
+
+def warmup():
+    """預熱：先走一次路由與 JSON 序列化，避免第一個 webhook 承擔冷啟動成本"""
+    try:
+        with app.test_client() as client:
+            client.get('/health')
+        logger.info("✅ WSGI app 預熱完成")
+    except Exception as e:
+        logger.warning(f"⚠️  預熱失敗: {e}")
+
+
+warmup()